@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Change journal reader for the Library Management System
+Streams only what changed since a sequence number, so exports and replicas
+can stay in sync without re-reading the whole catalog.
+
+    python lib/changes.py --since 42        # JSON lines for every change after seq 42
+    python lib/changes.py --latest          # highest sequence number written so far
+    python lib/changes.py --compact         # drop events superseded by later ones
+
+In sharded mode each database keeps its own journal; pass --shard N to read a
+shard's book changes (authors are always in the main journal).
+"""
+
+import argparse
+import json
+import sys
+
+from models import create_tables
+from models.journal import compact, iter_changes, latest_seq
+
+def main(argv=None):
+    """Parse arguments and run the requested journal command"""
+    parser = argparse.ArgumentParser(prog="changes", description="Read the catalog change journal")
+    parser.add_argument("--since", type=int, default=0, metavar="SEQ",
+                        help="only show changes after this sequence number")
+    parser.add_argument("--shard", type=int, default=None,
+                        help="read a shard's journal instead of the main one")
+    parser.add_argument("--latest", action="store_true",
+                        help="print the latest sequence number and exit")
+    parser.add_argument("--compact", action="store_true",
+                        help="remove events superseded by a later event for the same row")
+    parser.add_argument("--upto", type=int, default=None, metavar="SEQ",
+                        help="with --compact, only compact events up to this sequence number")
+    args = parser.parse_args(argv)
+
+    create_tables()
+
+    if args.latest:
+        print(latest_seq(args.shard))
+    elif args.compact:
+        removed = compact(args.upto, args.shard)
+        print(f"✅ Removed {removed} superseded change(s)", file=sys.stderr)
+    else:
+        for change in iter_changes(args.since, args.shard):
+            print(json.dumps(change.to_dict()))
+
+if __name__ == "__main__":
+    main()
@@ -4,33 +4,59 @@ Library Management System CLI
 A command-line interface for managing authors and books in a library database.
 """
 
+import argparse
+import os
+
+import profiling
 from helpers import (
     exit_program,
     initialize_database,
     create_author,
     create_book,
-    display_authors,
-    display_books,
+    list_all_authors,
+    list_all_books,
     find_author_by_id,
     find_author_by_name,
     find_book_by_id,
     find_book_by_title,
     find_books_by_author,
     find_books_by_genre,
+    find_books_by_year_range,
+    find_recent_books,
     delete_author,
     delete_book,
-    show_statistics
+    show_statistics,
+    show_analytics_report
 )
-from models.author import Author
-from models.book import Book
 
-def main():
+def parse_args(argv=None):
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Library Management System")
+    parser.add_argument(
+        "--profile", nargs="?", const=profiling.DEFAULT_PROFILE_DIR, metavar="DIR",
+        default=os.environ.get("LIBRARY_PROFILE"),
+        help="write a CPU/memory profile of every menu action to DIR (default: profiles)"
+    )
+    parser.add_argument(
+        "--mirror", action="store_true",
+        default=os.environ.get("LIBRARY_MIRROR", "0") not in ("", "0"),
+        help="load the database into memory at startup and serve reads from it"
+    )
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main CLI application loop"""
+    args = parse_args(argv)
+    if args.profile:
+        profiling.enable(args.profile)
+    
     print("🏛️  Welcome to the Library Management System! 📚")
     print("=" * 50)
+    if args.profile:
+        print(f"⏱️  Profiling menu actions to {args.profile}/")
     
     # Initialize database
-    if not initialize_database():
+    if not initialize_database(mirror=args.mirror):
         print("❌ Failed to initialize database. Exiting...")
         return
     
@@ -80,8 +106,7 @@ def author_menu():
         if choice == "0":
             break
         elif choice == "1":
-            authors = Author.get_all()
-            display_authors(authors, "All Authors")
+            list_all_authors()
         elif choice == "2":
             create_author()
         elif choice == "3":
@@ -111,8 +136,7 @@ def book_menu():
         if choice == "0":
             break
         elif choice == "1":
-            books = Book.get_all()
-            display_books(books, "All Books")
+            list_all_books()
         elif choice == "2":
             create_book()
         elif choice == "3":
@@ -135,6 +159,8 @@ def search_menu():
         print("2. Find Books by Genre")
         print("3. Find Author by Name")
         print("4. Find Book by Title")
+        print("5. Find Books by Publication Year")
+        print("6. Find Recent Books")
         
         choice = input("\n> ").strip()
         
@@ -148,8 +174,12 @@ def search_menu():
             find_author_by_name()
         elif choice == "4":
             find_book_by_title()
+        elif choice == "5":
+            find_books_by_year_range()
+        elif choice == "6":
+            find_recent_books()
         else:
-            print("❌ Invalid choice. Please select a number from 0-4.")
+            print("❌ Invalid choice. Please select a number from 0-6.")
 
 def statistics_menu():
     """Statistics and reports submenu"""
@@ -161,6 +191,7 @@ def statistics_menu():
         print("1. View Library Statistics")
         print("2. View All Authors")
         print("3. View All Books")
+        print("4. View Analytics Report")
         
         choice = input("\n> ").strip()
         
@@ -169,13 +200,13 @@ def statistics_menu():
         elif choice == "1":
             show_statistics()
         elif choice == "2":
-            authors = Author.get_all()
-            display_authors(authors, "All Authors")
+            list_all_authors()
         elif choice == "3":
-            books = Book.get_all()
-            display_books(books, "All Books")
+            list_all_books()
+        elif choice == "4":
+            show_analytics_report()
         else:
-            print("❌ Invalid choice. Please select a number from 0-3.")
+            print("❌ Invalid choice. Please select a number from 0-4.")
 
 if __name__ == "__main__":
     try:
@@ -4,10 +4,18 @@ This module provides functions to help with debugging and testing the applicatio
 """
 
 from models.author import Author
-from models.book import Book
-from models import create_tables, get_session
+from models.book import Book, current_year
+from models import create_tables, get_session, get_cache_stats, reset_cache_stats
+from models.author_index import author_index
+from models.sharding import router
+from models.journal import record_truncate
+from models import backup
+from models import maintenance
 from faker import Faker
+from sqlalchemy import insert
+import os
 import random
+import time
 
 fake = Faker()
 
@@ -37,7 +45,7 @@ def create_sample_data():
             book = Book.create(
                 title=fake.catch_phrase(),
                 isbn=fake.isbn13(),
-                publication_year=random.randint(1950, 2024),
+                publication_year=random.randint(1950, current_year()),
                 genre=random.choice(genres),
                 author_id=author.id
             )
@@ -45,6 +53,7 @@ def create_sample_data():
         except Exception as e:
             print(f"❌ Error creating book: {e}")
     
+    maintenance.refresh_statistics()
     print("🎉 Sample data creation completed!")
 
 def clear_all_data():
@@ -54,9 +63,20 @@ def clear_all_data():
     session = get_session()
     try:
         # Delete all books first (due to foreign key constraints)
+        if router:
+            router.scatter(lambda shard_session: (
+                shard_session.query(Book).delete(),
+                record_truncate(shard_session, Book),
+                shard_session.commit()
+            ))
         session.query(Book).delete()
         session.query(Author).delete()
+        # Journal the bulk deletes explicitly (see journal.record_changes)
+        record_truncate(session, Book)
+        record_truncate(session, Author)
         session.commit()
+        author_index.reset()
+        maintenance.refresh_statistics()
         print("✅ All data cleared successfully!")
     except Exception as e:
         session.rollback()
@@ -79,12 +99,8 @@ def show_database_info():
         print("\nAuthors:")
         for author in authors:
             # Get book count directly from database to avoid session issues
-            session = get_session()
-            try:
-                book_count = session.query(Book).filter(Book.author_id == author.id).count()
-                print(f"  - {author.name} ({author.email}) - {book_count} books")
-            finally:
-                session.close()
+            book_count = Book.count_by_author_id(author.id)
+            print(f"  - {author.name} ({author.email}) - {book_count} books")
     
     if books:
         print("\nBooks:")
@@ -109,6 +125,357 @@ def reset_database():
     except Exception as e:
         print(f"❌ Error resetting database: {e}")
 
+def benchmark_lookups(lookups=100000):
+    """Compare per-lookup overhead with and without the compiled statement cache"""
+    from models import author as author_module
+    from models import engine, engine_options
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session as OrmSession
+    
+    session = get_session()
+    try:
+        author_ids = [row[0] for row in session.query(Author.id).limit(1000)]
+    finally:
+        session.close()
+    
+    if not author_ids:
+        print("❌ No authors found. Create sample data first.")
+        return
+    
+    print(f"⏱️  Running {lookups} author lookups by ID...")
+    
+    # session.query() goes through the same cache, so the baseline needs an engine without one
+    uncached = create_engine(engine.url, **dict(engine_options(engine.url), query_cache_size=0))
+    
+    def run(lookup, open_session=get_session):
+        session = open_session()
+        try:
+            start = time.perf_counter()
+            for i in range(lookups):
+                lookup(session, author_ids[i % len(author_ids)])
+            return time.perf_counter() - start
+        finally:
+            session.close()
+    
+    def legacy(session, author_id):
+        return session.query(Author).filter(Author.id == author_id).first()
+    
+    def cached(session, author_id):
+        return session.execute(
+            author_module._FIND_BY_ID, {"author_id": author_id}
+        ).scalars().first()
+    
+    try:
+        baseline = run(legacy, lambda: OrmSession(bind=uncached))
+    finally:
+        uncached.dispose()
+    reset_cache_stats()
+    results = [
+        ("session.query(), no statement cache", baseline),
+        ("session.query(), statement cache", run(legacy)),
+        ("Pre-built select(), statement cache", run(cached)),
+    ]
+    
+    for label, elapsed in results:
+        per_lookup = elapsed / lookups * 1_000_000
+        print(f"   {label}: {per_lookup:.1f} µs/lookup ({lookups / elapsed:,.0f} lookups/sec)")
+    
+    stats = get_cache_stats()
+    print(f"   Statement cache: {stats['hits']} hits, {stats['misses']} misses, "
+          f"{stats['size']}/{stats['capacity']} entries")
+
+def _write_shard_books(arguments):
+    """Insert one writer's books from its own process; returns the number of failed writes"""
+    from models.sharding import ShardRouter
+    shard_count, url, writer, books_per_writer = arguments
+    shards = ShardRouter(shard_count, url)
+    # Each writer owns one author, so writers spread evenly over shards
+    author_id = writer + 1
+    session = shards.session_for_author(author_id)
+    errors = 0
+    try:
+        for i in range(books_per_writer):
+            try:
+                session.execute(insert(Book.__table__).values(
+                    id=shards.next_book_id(author_id),
+                    title=f"Book {writer}-{i}",
+                    isbn=f"{writer:05d}{i:08d}",
+                    publication_year=2000,
+                    genre="Benchmark",
+                    author_id=author_id
+                ))
+                session.commit()
+            except Exception:
+                session.rollback()
+                errors += 1
+    finally:
+        session.close()
+        shards.dispose()
+    return errors
+
+def benchmark_shard_writes(books_per_writer=200, writers=8, shard_counts=(1, 2, 4, 8)):
+    """Measure book insert throughput as the catalog is split across more shards"""
+    import multiprocessing
+    import tempfile
+    from models.sharding import ShardRouter
+    
+    print(f"⏱️  {writers} writer processes inserting {books_per_writer} books each...")
+    
+    for shard_count in shard_counts:
+        with tempfile.TemporaryDirectory() as directory:
+            url = f"sqlite:///{directory}/bench.db"
+            shards = ShardRouter(shard_count, url)
+            shards.create_tables()
+            shards.dispose()
+            
+            # Separate processes, so the GIL doesn't serialize the writers
+            arguments = [(shard_count, url, writer, books_per_writer) for writer in range(writers)]
+            with multiprocessing.Pool(writers) as pool:
+                start = time.perf_counter()
+                errors = sum(pool.map(_write_shard_books, arguments))
+                elapsed = time.perf_counter() - start
+        
+        written = writers * books_per_writer - errors
+        print(f"   {shard_count} shard(s): {written / elapsed:,.0f} writes/sec "
+              f"({errors} errors)")
+
+def _format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+def _print_snapshot(result):
+    rate = result.database_bytes / result.seconds if result.seconds else 0
+    print(f"   {result.path}: {_format_bytes(result.database_bytes)} in {result.seconds:.2f}s "
+          f"({_format_bytes(rate)}/s, file {_format_bytes(result.file_bytes)})")
+
+def create_snapshot():
+    """Take an online snapshot of the database without blocking writers"""
+    compress = input("Compress the snapshot? (yes/no): ").strip().lower() == 'yes'
+    print("📸 Creating snapshot...")
+    try:
+        for result in backup.create_snapshot(compress=compress):
+            _print_snapshot(result)
+        print("✅ Snapshot created successfully!")
+    except Exception as e:
+        print(f"❌ Error creating snapshot: {e}")
+
+def restore_snapshot():
+    """Replace the database with a previously taken snapshot"""
+    path = input("Snapshot file to restore: ").strip()
+    confirm = input("This will overwrite the current database. Continue? (yes/no): ")
+    if confirm.lower() != 'yes':
+        print("❌ Operation cancelled.")
+        return
+    try:
+        seconds = backup.restore_snapshot(path)
+        print(f"✅ Snapshot restored in {seconds:.2f}s!")
+    except Exception as e:
+        print(f"❌ Error restoring snapshot: {e}")
+
+def run_maintenance():
+    """Run integrity checks, incremental vacuum and ANALYZE now"""
+    convert = False
+    try:
+        pending = maintenance.pending_conversions()
+    except Exception as e:
+        print(f"❌ Error running maintenance: {e}")
+        return
+    if pending:
+        print(f"⚠️  {', '.join(pending)} still need(s) a one-time full VACUUM to turn on incremental "
+              "vacuum. It blocks writers until the whole file is rewritten.")
+        convert = input("Run it now? (yes/no): ").strip().lower() == 'yes'
+    
+    print("🧹 Running database maintenance...")
+    try:
+        for result in maintenance.run_maintenance(convert=convert):
+            print(f"   {result.database}: {_format_bytes(result.bytes_before)} -> "
+                  f"{_format_bytes(result.bytes_after)} in {result.seconds:.2f}s "
+                  f"({result.vacuum} vacuum, {result.pages_freed} page(s) freed, "
+                  f"{result.free_pages_left} left)")
+            if result.integrity != "ok":
+                print(f"   ⚠️  quick_check: {result.integrity}")
+        print("✅ Maintenance completed!")
+    except Exception as e:
+        print(f"❌ Error running maintenance: {e}")
+
+def benchmark_snapshot(target_mb=256, compress=True):
+    """Snapshot a generated database of about target_mb while a writer keeps inserting"""
+    import sqlite3
+    import tempfile
+    import threading
+    
+    with tempfile.TemporaryDirectory() as directory:
+        source_path = os.path.join(directory, "bench.db")
+        print(f"🏗️  Generating a {target_mb} MB database...")
+        connection = sqlite3.connect(source_path)
+        connection.execute("CREATE TABLE books (id INTEGER PRIMARY KEY, title TEXT, padding BLOB)")
+        padding = os.urandom(900)
+        batch = 10000
+        while os.path.getsize(source_path) < target_mb * 1024 * 1024:
+            connection.executemany(
+                "INSERT INTO books (title, padding) VALUES (?, ?)",
+                ((f"Book {i}", padding) for i in range(batch))
+            )
+            connection.commit()
+        connection.close()
+        
+        stop = threading.Event()
+        latencies = []
+        errors = []
+        
+        def write():
+            writer = sqlite3.connect(source_path, timeout=30)
+            try:
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    try:
+                        writer.execute("INSERT INTO books (title, padding) VALUES ('live', ?)", (padding,))
+                        writer.commit()
+                        latencies.append(time.perf_counter() - start)
+                    except sqlite3.Error as e:
+                        errors.append(e)
+                    time.sleep(0.01)
+            finally:
+                writer.close()
+        
+        thread = threading.Thread(target=write)
+        thread.start()
+        try:
+            suffix = ".db.gz" if compress else ".db"
+            result = backup.snapshot_file(
+                source_path, os.path.join(directory, "snapshot" + suffix), compress=compress
+            )
+        finally:
+            stop.set()
+            thread.join()
+        
+        _print_snapshot(result)
+        if latencies:
+            latencies.sort()
+            print(f"   Concurrent writes: {len(latencies)} committed, {len(errors)} failed, "
+                  f"p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+                  f"max {latencies[-1] * 1000:.1f} ms")
+
+def benchmark_analytics(rows=1_000_000, authors=50_000):
+    """Time the columnar fetch and vectorized report on a generated catalog of `rows` books"""
+    import sqlite3
+    import tempfile
+    from sqlalchemy import create_engine
+    
+    try:
+        import analytics
+    except ImportError:
+        print("❌ The analytics benchmark needs numpy.")
+        return
+    
+    genres = ["Fiction", "Non-Fiction", "Science Fiction", "Mystery", "Romance", "Biography", "History", "Poetry"]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        print(f"🏗️  Generating {rows:,} books...")
+        connection = sqlite3.connect(path)
+        connection.execute(
+            "CREATE TABLE books (id INTEGER PRIMARY KEY, publication_year INTEGER, "
+            "genre TEXT, author_id INTEGER)"
+        )
+        batch = 100_000
+        for offset in range(0, rows, batch):
+            connection.executemany(
+                "INSERT INTO books (publication_year, genre, author_id) VALUES (?, ?, ?)",
+                ((random.randint(1900, current_year()), random.choice(genres), random.randint(1, authors))
+                 for _ in range(min(batch, rows - offset)))
+            )
+        connection.commit()
+        connection.close()
+        
+        bench_engine = create_engine(f"sqlite:///{path}")
+        start = time.perf_counter()
+        columns = analytics.fetch_columns([bench_engine])
+        fetched = time.perf_counter()
+        report = analytics.render_report(columns)
+        finished = time.perf_counter()
+        bench_engine.dispose()
+    
+    print(report)
+    print(f"\n⏱️  Fetch: {fetched - start:.2f}s | Compute + render: {finished - fetched:.3f}s "
+          f"| {rows / (finished - start):,.0f} rows/sec")
+
+def benchmark_write_queue(producers=32, writes_per_producer=100):
+    """Compare concurrent writers committing directly against the serialized write queue"""
+    import tempfile
+    import threading
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from models import Base, engine_options
+    from models.write_queue import WriteQueue
+    
+    def run_producers(write):
+        errors = []
+        
+        def produce(producer):
+            for i in range(writes_per_producer):
+                try:
+                    write(producer, i)
+                except Exception as e:
+                    errors.append(e)
+        
+        threads = [threading.Thread(target=produce, args=(p,)) for p in range(producers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start, errors
+    
+    total = producers * writes_per_producer
+    print(f"⏱️  {producers} producers writing {writes_per_producer} authors each...")
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{directory}/bench.db"
+        bench_engine = create_engine(url, **engine_options(url))
+        Base.metadata.create_all(bench_engine)
+        
+        # Baseline: every producer commits through its own session
+        BenchSession = sessionmaker(bind=bench_engine)
+        
+        def direct(producer, i):
+            session = BenchSession()
+            try:
+                session.add(Author(name=f"Direct {producer}-{i}", email=f"d{producer}-{i}@example.com"))
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+        
+        elapsed, errors = run_producers(direct)
+        print(f"   Direct commits: {(total - len(errors)) / elapsed:,.0f} writes/sec, "
+              f"{len(errors)} errors")
+        
+        # Write queue: producers block on their futures, one writer batches commits
+        write_queue = WriteQueue(bind=bench_engine)
+        
+        def queued(producer, i):
+            write_queue.create_author(f"Queued {producer}-{i}", f"q{producer}-{i}@example.com").result()
+        
+        elapsed, errors = run_producers(queued)
+        write_queue.close()
+        stats = write_queue.stats
+        print(f"   Write queue: {(total - len(errors)) / elapsed:,.0f} writes/sec, "
+              f"{len(errors)} errors, {stats['batches']} batches "
+              f"(avg {stats['requests'] / max(stats['batches'], 1):.1f} writes/batch)")
+        
+        # A duplicate email in the same batch fails only its own future
+        write_queue = WriteQueue(bind=bench_engine, linger=0.05)
+        good = write_queue.create_author("Unique", "unique@example.com")
+        bad = write_queue.create_author("Duplicate", "unique@example.com")
+        write_queue.close()
+        isolated = good.exception() is None and bad.exception() is not None
+        print(f"   Duplicate email rejected on its own future: {isolated}")
+        bench_engine.dispose()
+    author_index.reset()
+
 def main():
     """Debug menu for testing and development"""
     while True:
@@ -120,6 +487,11 @@ def main():
         print("2. Clear All Data")
         print("3. Show Database Info")
         print("4. Reset Database")
+        print("5. Benchmark Lookups")
+        print("6. Benchmark Sharded Writes")
+        print("7. Create Snapshot")
+        print("8. Restore Snapshot")
+        print("9. Run Maintenance")
         
         choice = input("\n> ").strip()
         
@@ -141,8 +513,18 @@ def main():
                 reset_database()
             else:
                 print("❌ Operation cancelled.")
+        elif choice == "5":
+            benchmark_lookups()
+        elif choice == "6":
+            benchmark_shard_writes()
+        elif choice == "7":
+            create_snapshot()
+        elif choice == "8":
+            restore_snapshot()
+        elif choice == "9":
+            run_maintenance()
         else:
-            print("❌ Invalid choice. Please select a number from 0-4.")
+            print("❌ Invalid choice. Please select a number from 0-9.")
 
 if __name__ == "__main__":
     main()
@@ -1,24 +1,60 @@
 from models.author import Author
-from models.book import Book
+from models.book import MIN_PUBLICATION_YEAR, Book, current_year, valid_isbn, valid_publication_year
 from models import create_tables
+from models.author_index import author_index
+from models import maintenance
+from models.mirror import mirror as memory_mirror
+from profiling import profiled
 import re
 
+# Maximum number of suggestions shown by the author picker
+AUTOCOMPLETE_LIMIT = 10
+
 def exit_program():
     """Exit the program with a goodbye message"""
     print("\nThank you for using the Library Management System!")
     print("Goodbye! 📚")
     exit()
 
-def initialize_database():
-    """Initialize the database and create tables"""
+def initialize_database(mirror=False):
+    """Initialize the database and create tables, optionally loading the in-memory mirror"""
     try:
         create_tables()
         print("✅ Database initialized successfully!")
-        return True
     except Exception as e:
         print(f"❌ Error initializing database: {e}")
         return False
 
+    # Maintenance problems are reported but never keep the app from starting
+    try:
+        results = maintenance.run_if_due()
+        if results:
+            before = sum(r.bytes_before for r in results)
+            after = sum(r.bytes_after for r in results)
+            seconds = sum(r.seconds for r in results)
+            print(f"🧹 Scheduled maintenance: {before / 1024:.0f} KB -> {after / 1024:.0f} KB "
+                  f"in {seconds:.2f}s")
+            for result in results:
+                if result.integrity != "ok":
+                    print(f"⚠️  Integrity check failed on {result.database}: {result.integrity}")
+                if result.vacuum == maintenance.CONVERSION_NEEDED:
+                    print(f"⚠️  {result.database} needs a one-time full VACUUM before free space can be "
+                          f"reclaimed; run it from the debug menu (python lib/debug.py, option 9)")
+    except Exception as e:
+        print(f"⚠️  Scheduled maintenance failed: {e}")
+
+    if mirror:
+        try:
+            load = memory_mirror.load()
+            if load.loaded:
+                print(f"🪞 Loaded {load.database_bytes / 1024 / 1024:.1f} MB into memory "
+                      f"in {load.seconds:.2f}s; reads are served from the mirror")
+            else:
+                print(f"⚠️  Not mirroring: {load.reason}. Reading from disk.")
+        except Exception as e:
+            print(f"⚠️  Could not load the in-memory mirror ({e}). Reading from disk.")
+    return True
+
 def validate_email(email):
     """Validate email format"""
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -26,17 +62,13 @@ def validate_email(email):
 
 def validate_isbn(isbn):
     """Validate ISBN format (basic validation)"""
-    # Remove hyphens and spaces
-    clean_isbn = re.sub(r'[-\s]', '', isbn)
-    # Check if it's 10 or 13 digits
-    return len(clean_isbn) in [10, 13] and clean_isbn.isdigit()
+    # Same rule the catalog sync applies to imported books
+    return valid_isbn(isbn)
 
 def validate_year(year_str):
     """Validate publication year"""
     try:
-        year = int(year_str)
-        current_year = 2024
-        return 1000 <= year <= current_year
+        return valid_publication_year(int(year_str))
     except ValueError:
         return False
 
@@ -62,32 +94,74 @@ def get_user_input(prompt, validator=None, error_msg="Invalid input. Please try
             return None
 
 def display_authors(authors, title="Authors"):
-    """Display a list of authors in a formatted way"""
-    if not authors:
-        print(f"\n📝 No {title.lower()} found.")
-        return
-    
-    print(f"\n📚 {title}:")
-    print("=" * 60)
+    """Display authors from a list or streaming iterator as they arrive"""
+    shown = 0
     for author in authors:
+        if not shown:
+            print(f"\n📚 {title}:")
+            print("=" * 60)
         print(f"ID: {author.id} | {author.display_name}")
         print(f"   Books: {author.book_count}")
         print("-" * 40)
+        shown += 1
+    
+    if not shown:
+        print(f"\n📝 No {title.lower()} found.")
 
 def display_books(books, title="Books"):
-    """Display a list of books in a formatted way"""
-    if not books:
-        print(f"\n📖 No {title.lower()} found.")
-        return
-    
-    print(f"\n📚 {title}:")
-    print("=" * 80)
+    """Display books from a list or streaming iterator as they arrive"""
+    shown = 0
     for book in books:
+        if not shown:
+            print(f"\n📚 {title}:")
+            print("=" * 80)
         print(f"ID: {book.id} | {book.display_title}")
         print(f"   ISBN: {book.isbn} | Year: {book.publication_year} | Genre: {book.genre}")
         print(f"   Age: {book.age} years old {'(Recent)' if book.is_recent else ''}")
         print("-" * 50)
+        shown += 1
+    
+    if not shown:
+        print(f"\n📖 No {title.lower()} found.")
 
+def select_author(prompt="Enter author ID"):
+    """Let the user narrow authors down by name/email prefix, then pick one by ID"""
+    if not len(author_index):
+        print("❌ No authors found.")
+        return None
+    
+    while True:
+        entry = get_user_input(f"{prompt} (or type a name/email prefix to search): ")
+        if not entry:
+            return None
+        
+        if entry.isdigit():
+            author = Author.find_by_id(int(entry))
+            if not author:
+                print(f"❌ Author with ID {entry} not found!")
+                return None
+            return author
+        
+        matches = Author.autocomplete(entry, limit=AUTOCOMPLETE_LIMIT)
+        if not matches:
+            print(f"📝 No authors starting with '{entry}'. Try another prefix.")
+            continue
+        
+        print(f"\n🔎 Authors matching '{entry}':")
+        for match in matches:
+            print(f"   ID: {match.id} | {match.name} ({match.email})")
+
+@profiled
+def list_all_authors():
+    """Display every author"""
+    display_authors(Author.iter_all(), "All Authors")
+
+@profiled
+def list_all_books():
+    """Display every book"""
+    display_books(Book.iter_all(), "All Books")
+
+@profiled
 def create_author():
     """Create a new author"""
     print("\n📝 Creating New Author")
@@ -119,33 +193,17 @@ def create_author():
         print(f"❌ Error creating author: {e}")
         return None
 
+@profiled
 def create_book():
     """Create a new book"""
     print("\n📖 Creating New Book")
     print("=" * 30)
     
-    # First, show available authors
-    authors = Author.get_all()
-    if not authors:
-        print("❌ No authors found. Please create an author first.")
-        return None
-    
-    display_authors(authors, "Available Authors")
-    
-    # Get author ID
-    author_id_input = get_user_input("Enter author ID: ")
-    if not author_id_input:
-        return None
-    
-    try:
-        author_id = int(author_id_input)
-        author = Author.find_by_id(author_id)
-        if not author:
-            print(f"❌ Author with ID {author_id} not found!")
-            return None
-    except ValueError:
-        print("❌ Please enter a valid author ID number.")
+    # First, pick the author
+    author = select_author()
+    if not author:
         return None
+    author_id = author.id
     
     # Get book details
     title = get_user_input("Enter book title: ")
@@ -169,7 +227,7 @@ def create_book():
     year_input = get_user_input(
         "Enter publication year: ",
         validator=validate_year,
-        error_msg="Please enter a valid year (1000-2024)."
+        error_msg=f"Please enter a valid year ({MIN_PUBLICATION_YEAR}-{current_year()})."
     )
     if not year_input:
         return None
@@ -194,6 +252,7 @@ def create_book():
         print(f"❌ Error creating book: {e}")
         return None
 
+@profiled
 def find_author_by_id():
     """Find and display an author by ID"""
     author_id_input = get_user_input("Enter author ID: ")
@@ -202,7 +261,7 @@ def find_author_by_id():
     
     try:
         author_id = int(author_id_input)
-        author = Author.find_by_id(author_id)
+        author = Author.find_by_id(author_id, with_books=True)
         if author:
             display_authors([author], "Author Found")
             if author.books:
@@ -212,15 +271,17 @@ def find_author_by_id():
     except ValueError:
         print("❌ Please enter a valid author ID number.")
 
+@profiled
 def find_author_by_name():
     """Find and display authors by name"""
     name = get_user_input("Enter author name (partial match): ")
     if not name:
         return
     
-    authors = Author.find_by_name(name)
+    authors = Author.iter_by_name(name)
     display_authors(authors, f"Authors matching '{name}'")
 
+@profiled
 def find_book_by_id():
     """Find and display a book by ID"""
     book_id_input = get_user_input("Enter book ID: ")
@@ -237,69 +298,66 @@ def find_book_by_id():
     except ValueError:
         print("❌ Please enter a valid book ID number.")
 
+@profiled
 def find_book_by_title():
     """Find and display books by title"""
     title = get_user_input("Enter book title (partial match): ")
     if not title:
         return
     
-    books = Book.find_by_title(title)
+    books = Book.iter_by_title(title)
     display_books(books, f"Books matching '{title}'")
 
+@profiled
 def find_books_by_author():
     """Find and display books by author"""
-    authors = Author.get_all()
-    if not authors:
-        print("❌ No authors found.")
-        return
-    
-    display_authors(authors, "Available Authors")
-    
-    author_id_input = get_user_input("Enter author ID: ")
-    if not author_id_input:
+    author = select_author()
+    if not author:
         return
     
-    try:
-        author_id = int(author_id_input)
-        author = Author.find_by_id(author_id)
-        if not author:
-            print(f"❌ Author with ID {author_id} not found!")
-            return
-        
-        books = Book.find_by_author_id(author_id)
-        display_books(books, f"Books by {author.name}")
-    except ValueError:
-        print("❌ Please enter a valid author ID number.")
+    books = Book.iter_by_author_id(author.id)
+    display_books(books, f"Books by {author.name}")
 
+@profiled
 def find_books_by_genre():
     """Find and display books by genre"""
     genre = get_user_input("Enter genre (partial match): ")
     if not genre:
         return
     
-    books = Book.find_by_genre(genre)
+    books = Book.iter_by_genre(genre)
     display_books(books, f"Books in genre '{genre}'")
 
-def delete_author():
-    """Delete an author and their books"""
-    authors = Author.get_all()
-    if not authors:
-        print("❌ No authors found.")
+@profiled
+def find_books_by_year_range():
+    """Find and display books published within a range of years"""
+    error_msg = f"Please enter a valid year ({MIN_PUBLICATION_YEAR}-{current_year()})."
+    start_input = get_user_input("Enter start year: ", validator=validate_year, error_msg=error_msg)
+    if not start_input:
         return
     
-    display_authors(authors, "Available Authors")
+    end_input = get_user_input("Enter end year: ", validator=validate_year, error_msg=error_msg)
+    if not end_input:
+        return
     
-    author_id_input = get_user_input("Enter author ID to delete: ")
-    if not author_id_input:
+    start_year, end_year = sorted((int(start_input), int(end_input)))
+    books = Book.find_by_year_range(start_year, end_year)
+    display_books(books, f"Books published {start_year}-{end_year}")
+
+@profiled
+def find_recent_books():
+    """Find and display books published in the last 10 years"""
+    books = Book.find_recent()
+    display_books(books, "Recent Books")
+
+@profiled
+def delete_author():
+    """Delete an author and their books"""
+    author = select_author("Enter author ID to delete")
+    if not author:
         return
     
     try:
-        author_id = int(author_id_input)
-        author = Author.find_by_id(author_id)
-        if not author:
-            print(f"❌ Author with ID {author_id} not found!")
-            return
-        
         # Show what will be deleted
         print(f"\n⚠️  This will delete:")
         print(f"   - Author: {author.display_name}")
@@ -311,19 +369,17 @@ def delete_author():
             print(f"✅ Author '{author.name}' and their books deleted successfully!")
         else:
             print("❌ Deletion cancelled.")
-    except ValueError:
-        print("❌ Please enter a valid author ID number.")
     except Exception as e:
         print(f"❌ Error deleting author: {e}")
 
+@profiled
 def delete_book():
     """Delete a book"""
-    books = Book.get_all()
-    if not books:
+    if not Book.count():
         print("❌ No books found.")
         return
     
-    display_books(books, "Available Books")
+    display_books(Book.iter_all(), "Available Books")
     
     book_id_input = get_user_input("Enter book ID to delete: ")
     if not book_id_input:
@@ -349,36 +405,50 @@ def delete_book():
     except Exception as e:
         print(f"❌ Error deleting book: {e}")
 
+@profiled
+def show_analytics_report():
+    """Show decade, author output and genre-by-decade distributions"""
+    try:
+        import analytics
+    except ImportError:
+        print("❌ The analytics report needs numpy. Install it with: pipenv install numpy")
+        return
+    
+    try:
+        analytics.show_report()
+    except Exception as e:
+        print(f"❌ Error building analytics report: {e}")
+
+@profiled
 def show_statistics():
     """Show library statistics"""
-    authors = Author.get_all()
-    books = Book.get_all()
+    author_total = Author.count()
+    book_total = Book.count()
     
     print("\n📊 Library Statistics")
     print("=" * 30)
-    print(f"Total Authors: {len(authors)}")
-    print(f"Total Books: {len(books)}")
+    print(f"Total Authors: {author_total}")
+    print(f"Total Books: {book_total}")
     
-    if books:
+    if book_total:
         # Genre statistics
-        genres = {}
-        for book in books:
-            genres[book.genre] = genres.get(book.genre, 0) + 1
-        
         print(f"\n📚 Books by Genre:")
-        for genre, count in sorted(genres.items()):
+        for genre, count in Book.count_by_genre():
             print(f"   {genre}: {count}")
         
+        # Decade breakdown
+        print(f"\n🗓️  Books by Decade:")
+        for decade, count in Book.count_by_decade():
+            print(f"   {decade}s: {count}")
+        
         # Recent books
-        recent_books = [book for book in books if book.is_recent]
-        print(f"\n🆕 Recent Books (last 10 years): {len(recent_books)}")
+        print(f"\n🆕 Recent Books (last 10 years): {Book.count_recent()}")
         
         # Average book age
-        if books:
-            avg_age = sum(book.age for book in books) / len(books)
-            print(f"📅 Average Book Age: {avg_age:.1f} years")
+        avg_age = Book.average_age()
+        print(f"📅 Average Book Age: {avg_age:.1f} years")
     
-    if authors:
+    if author_total:
         # Author with most books
-        author_with_most_books = max(authors, key=lambda a: a.book_count)
-        print(f"\n👑 Most Prolific Author: {author_with_most_books.name} ({author_with_most_books.book_count} books)")
+        author_with_most_books, most_books = Author.most_prolific()
+        print(f"\n👑 Most Prolific Author: {author_with_most_books.name} ({most_books} books)")
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Session replay load test for the Library Management System
+Runs scripted user sessions through the CLI's menus, with every input()
+prompt (menu choices included) answered from the script, in many worker
+processes sharing one database. Reports latency percentiles per action, error and lock rates, and
+throughput as JSON.
+
+    python lib/loadtest.py --workers 8 --sessions 50
+    python lib/loadtest.py --workers 16 --duration 60 --output load.json
+
+Every session cleans up after itself by deleting the author it created, but
+it does write to DATABASE_URL, so point that at a copy of production data.
+"""
+
+import argparse
+import builtins
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import cli
+from helpers import initialize_database
+from models import engine
+from models.author import Author
+from models.book import current_year
+
+PERCENTILES = (50, 90, 95, 99)
+GENRES = ["Fiction", "Mystery", "Science Fiction", "History", "Poetry", "Romance"]
+# Error messages kept per action in the report
+ERROR_SAMPLES = 5
+
+class ScriptExhausted(Exception):
+    """An action asked for more input than its step scripted"""
+
+# The prompt cli's menu loops read choices from
+MENU_PROMPT = "\n> "
+
+def _scripted_input(choice, answers):
+    """Answer one visit to a submenu: pick choice, run the action, then go back.
+
+    Answers are only handed to the action's own prompts. If the menu asks for
+    its next choice while answers are left over, the action stopped early;
+    going back with "0" keeps those answers from being read as menu choices.
+    """
+    state = {"chosen": False}
+    def scripted(prompt=""):
+        if prompt == MENU_PROMPT:
+            if not state["chosen"]:
+                state["chosen"] = True
+                return choice
+            if answers:
+                print(f"❌ Action stopped with {len(answers)} scripted answer(s) unused")
+            return "0"
+        if not answers:
+            raise ScriptExhausted(f"No scripted answer for prompt {prompt.strip()!r}")
+        return answers.pop(0)
+    return scripted
+
+def session_script(books=3):
+    """Return the steps of one session as (action, menu, choice, answers(context))"""
+    steps = [
+        ("create_author", cli.author_menu, "2",
+         lambda ctx: [f"Load Author {ctx['tag']}", ctx["email"]]),
+    ]
+    for number in range(books):
+        steps.append(("create_book", cli.book_menu, "2", lambda ctx, number=number: [
+            str(ctx["author_id"]),
+            f"Load Title {ctx['tag']} {number}",
+            ctx["isbn"](),
+            str(random.randint(1950, current_year())),
+            random.choice(GENRES),
+        ]))
+    steps += [
+        ("find_book_by_title", cli.book_menu, "4", lambda ctx: [f"Title {ctx['tag']}"]),
+        ("find_books_by_genre", cli.search_menu, "2", lambda ctx: [random.choice(GENRES)]),
+        ("find_author_by_id", cli.author_menu, "3", lambda ctx: [str(ctx["author_id"])]),
+        ("find_books_by_author", cli.search_menu, "1", lambda ctx: [str(ctx["author_id"])]),
+        ("show_statistics", cli.statistics_menu, "1", lambda ctx: []),
+        ("delete_author", cli.author_menu, "5", lambda ctx: [str(ctx["author_id"]), "yes"]),
+    ]
+    return steps
+
+def _classify(output, error):
+    """Return (failed, locked, message) for one action's output and exception"""
+    text = output + (error or "")
+    failures = [line.strip() for line in text.splitlines() if "❌" in line]
+    if error:
+        failures.append(error)
+    locked = "database is locked" in text
+    return bool(failures), locked, failures[0] if failures else None
+
+def run_worker(worker, sessions, duration, books, think, seed):
+    """Replay sessions in this process; return raw latencies and error counts"""
+    # Connections inherited from the parent must not be shared across processes
+    engine.dispose(close=False)
+    random.seed(seed + worker)
+    original_input = builtins.input
+    isbn_counter = iter(range(10 ** 8))
+    samples = {}
+    leftovers = []
+    deadline = time.monotonic() + duration if duration else None
+
+    completed = 0
+    try:
+        while (deadline is None and completed < sessions) or (deadline and time.monotonic() < deadline):
+            tag = f"{os.getpid()}-{worker}-{completed}"
+            context = {
+                "failed": set(),
+                "tag": tag,
+                "email": f"load-{tag}@example.com",
+                # 13 digits, unique per worker for the whole run
+                "isbn": lambda: f"9{worker % 10000:04d}{next(isbn_counter):08d}",
+            }
+            for action, menu, choice, answers in session_script(books):
+                stats = samples.setdefault(
+                    action, {"latencies": [], "errors": 0, "locked": 0, "skipped": 0, "messages": []}
+                )
+                try:
+                    builtins.input = _scripted_input(choice, answers(context))
+                except KeyError:
+                    # An earlier step of this session failed, so this one can't run
+                    stats["skipped"] += 1
+                    context["failed"].add(action)
+                    continue
+
+                output, error = io.StringIO(), None
+                start = time.perf_counter()
+                try:
+                    with contextlib.redirect_stdout(output):
+                        menu()
+                except Exception as e:
+                    error = f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"
+                stats["latencies"].append(time.perf_counter() - start)
+
+                failed, locked, message = _classify(output.getvalue(), error)
+                if failed:
+                    context["failed"].add(action)
+                    stats["errors"] += 1
+                    stats["locked"] += locked
+                    if len(stats["messages"]) < ERROR_SAMPLES:
+                        stats["messages"].append(message)
+                elif action == "create_author":
+                    # The menu drops the helper's return value, so look the new author up
+                    author = Author.find_by_email(context["email"])
+                    if author:
+                        context["author_id"] = author.id
+                if think:
+                    time.sleep(random.uniform(0, 2 * think))
+            # A create can commit and still report an error, so look authors up by email
+            if context["failed"] & {"create_author", "delete_author"}:
+                leftovers.append(context["email"])
+            completed += 1
+    finally:
+        builtins.input = original_input
+    return {"sessions": completed, "actions": samples, "leftover_authors": _clean_up(leftovers)}
+
+def _clean_up(emails, attempts=5):
+    """Delete authors whose session failed before deleting them; return how many remain"""
+    remaining = list(emails)
+    for _ in range(attempts):
+        failed = []
+        for email in remaining:
+            try:
+                author = Author.find_by_email(email)
+                if author:
+                    author.delete()
+            except Exception:
+                failed.append(email)
+        remaining = failed
+        if not remaining:
+            break
+        time.sleep(0.1)
+    return len(remaining)
+
+def _run_worker(arguments):
+    return run_worker(*arguments)
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-pct * len(sorted_values) // 100))
+    return sorted_values[int(rank) - 1]
+
+def summarize(results, elapsed, workers):
+    """Merge worker results into the JSON report"""
+    merged = {}
+    sessions = leftover_authors = 0
+    for result in results:
+        sessions += result["sessions"]
+        leftover_authors += result["leftover_authors"]
+        for action, stats in result["actions"].items():
+            into = merged.setdefault(
+                action, {"latencies": [], "errors": 0, "locked": 0, "skipped": 0, "messages": []}
+            )
+            into["latencies"] += stats["latencies"]
+            for key in ("errors", "locked", "skipped"):
+                into[key] += stats[key]
+            into["messages"] += stats["messages"][:ERROR_SAMPLES - len(into["messages"])]
+
+    actions = {}
+    total_calls = total_errors = total_locked = 0
+    for action, stats in merged.items():
+        latencies = sorted(stats["latencies"])
+        calls = len(latencies)
+        report = {
+            "calls": calls,
+            "errors": stats["errors"],
+            "locked": stats["locked"],
+            "skipped": stats["skipped"],
+            "error_rate": round(stats["errors"] / calls, 4) if calls else None,
+            "mean_ms": round(sum(latencies) / calls * 1000, 3) if calls else None,
+            "max_ms": round(latencies[-1] * 1000, 3) if calls else None,
+        }
+        for pct in PERCENTILES:
+            value = percentile(latencies, pct)
+            report[f"p{pct}_ms"] = round(value * 1000, 3) if value is not None else None
+        if stats["messages"]:
+            report["sample_errors"] = stats["messages"]
+        actions[action] = report
+        total_calls += calls
+        total_errors += stats["errors"]
+        total_locked += stats["locked"]
+
+    return {
+        "database": str(engine.url),
+        "workers": workers,
+        "sessions": sessions,
+        "elapsed_seconds": round(elapsed, 3),
+        "actions_per_second": round(total_calls / elapsed, 2) if elapsed else None,
+        "sessions_per_second": round(sessions / elapsed, 2) if elapsed else None,
+        "calls": total_calls,
+        "errors": total_errors,
+        "locked": total_locked,
+        "error_rate": round(total_errors / total_calls, 4) if total_calls else None,
+        "lock_rate": round(total_locked / total_calls, 4) if total_calls else None,
+        "leftover_authors": leftover_authors,
+        "actions": actions,
+    }
+
+def run(workers, sessions, duration=None, books=3, think=0.0, seed=0):
+    """Run the load test and return the report"""
+    # Create tables once up front instead of racing on it in every worker
+    with contextlib.redirect_stdout(io.StringIO()):
+        if not initialize_database():
+            raise RuntimeError("Could not initialize the database")
+    engine.dispose()
+
+    arguments = [(worker, sessions, duration, books, think, seed) for worker in range(workers)]
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        results = pool.map(_run_worker, arguments)
+    return summarize(results, time.perf_counter() - start, workers)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="loadtest", description="Replay scripted CLI sessions under load")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="concurrent worker processes (default: CPU count)")
+    parser.add_argument("--sessions", type=int, default=20,
+                        help="sessions per worker (ignored with --duration)")
+    parser.add_argument("--duration", type=float, default=None, metavar="SECONDS",
+                        help="keep starting sessions until this many seconds have passed")
+    parser.add_argument("--books", type=int, default=3, help="books added per session")
+    parser.add_argument("--think", type=float, default=0.0, metavar="SECONDS",
+                        help="mean pause between actions, like a user reading the screen")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--output", metavar="FILE", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    print(f"⏱️  {args.workers} worker(s) replaying sessions against {engine.url}...", file=sys.stderr)
+    report = run(args.workers, args.sessions, args.duration, args.books, args.think, args.seed)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(text + "\n")
+        print(f"✅ Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,150 @@
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import create_engine, event, inspect, Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import Session as OrmSession, sessionmaker, relationship
 from datetime import datetime
+import hashlib
 import os
 
 # Database setup
 DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///library.db')
-engine = create_engine(DATABASE_URL, echo=False)
-Session = sessionmaker(bind=engine)
+# Rows fetched per round trip by the streaming iter_* finders
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', '500'))
+# Number of compiled statements SQLAlchemy keeps per engine
+QUERY_CACHE_SIZE = int(os.environ.get('QUERY_CACHE_SIZE', '500'))
+# Seconds a SQLite connection waits on a locked database before failing
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', '30'))
+
+def engine_options(url):
+    """Return create_engine() keyword arguments shared by every catalog database"""
+    options = {"echo": False, "query_cache_size": QUERY_CACHE_SIZE}
+    if str(url).startswith("sqlite"):
+        options["connect_args"] = {"timeout": SQLITE_BUSY_TIMEOUT}
+    return options
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+# Where SELECTs go instead of `engine` while an in-memory mirror is loaded
+_read_engine = None
+
+class CatalogSession(OrmSession):
+    """Session that sends SELECTs to the in-memory mirror when one is loaded.
+
+    Once the session has written in its current transaction it reads from the
+    file until that transaction ends, since the mirror only gets the writes
+    when they commit.
+    """
+
+    def get_bind(self, mapper=None, *, clause=None, **kw):
+        if _read_engine is not None and clause is not None and clause.is_select \
+                and not self.info.get("pending_writes"):
+            return _read_engine
+        return super().get_bind(mapper, clause=clause, **kw)
+
+@event.listens_for(CatalogSession, "after_flush")
+def _flushed_writes(session, flush_context):
+    session.info["pending_writes"] = True
+
+@event.listens_for(CatalogSession, "do_orm_execute")
+def _executed_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["pending_writes"] = True
+
+@event.listens_for(CatalogSession, "after_transaction_end")
+def _ended_transaction(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("pending_writes", None)
+
+def use_read_engine(bind):
+    """Serve catalog SELECTs from bind (None: back to the main engine)"""
+    global _read_engine
+    _read_engine = bind
+
+Session = sessionmaker(bind=engine, class_=CatalogSession)
 Base = declarative_base()
 
+# Compiled statement cache outcomes, counted per executed statement
+_cache_stats = {"hits": 0, "misses": 0, "uncached": 0}
+
+@event.listens_for(engine, "before_cursor_execute")
+def _record_cache_use(conn, cursor, statement, parameters, context, executemany):
+    if context is None:
+        return
+    cache_hit = getattr(context, "cache_hit", None)
+    if cache_hit is CACHE_HIT:
+        _cache_stats["hits"] += 1
+    elif cache_hit is CACHE_MISS:
+        _cache_stats["misses"] += 1
+    else:
+        _cache_stats["uncached"] += 1
+
+def get_cache_stats():
+    """Return compiled statement cache hits, misses and current size"""
+    stats = dict(_cache_stats)
+    stats["size"] = len(engine._compiled_cache) if engine._compiled_cache is not None else 0
+    stats["capacity"] = QUERY_CACHE_SIZE
+    return stats
+
+def reset_cache_stats():
+    """Zero the cache hit/miss counters"""
+    for key in _cache_stats:
+        _cache_stats[key] = 0
+
+def content_hash(*values):
+    """Return a stable digest of a row's content, used to spot rows that changed"""
+    text = "\x1f".join("" if value is None else str(value) for value in values)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def add_missing_columns(bind, tables):
+    """Add nullable columns that an older database file's tables don't have yet"""
+    inspector = inspect(bind)
+    with bind.begin() as connection:
+        for table in tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(bind.dialect)
+                    connection.exec_driver_sql(
+                        f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                    )
+
 def create_tables():
     """Create all tables in the database"""
     # Import models to ensure they are registered
-    from . import author, book
+    from . import author, book, journal, maintenance
+    maintenance.use_incremental_vacuum(engine)
+    maintenance.use_wal(engine)
     Base.metadata.create_all(engine)
+    # create_all only builds columns and indexes for new tables, so add any
+    # that an older database file is missing
+    add_missing_columns(engine, Base.metadata.sorted_tables)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+    
+    from .sharding import router
+    if router:
+        router.create_tables()
+        router.move_books_from(engine)
 
 def get_session():
     """Get a new database session"""
     return Session()
+
+def stream(statement, chunk_size=None):
+    """Yield ORM objects for a select() in chunks of chunk_size rows.
+
+    The session stays open for the life of the iterator and is closed once
+    it is exhausted or garbage collected, so only one chunk is held at a time.
+    """
+    session = get_session()
+    try:
+        result = session.execute(
+            statement.execution_options(yield_per=chunk_size or STREAM_CHUNK_SIZE)
+        ).scalars()
+        for obj in result:
+            yield obj
+    finally:
+        session.close()
+
+# Register the change journal's flush hook for every session
+from . import journal  # noqa: E402,F401
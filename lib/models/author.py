@@ -1,7 +1,11 @@
-from sqlalchemy import Column, Integer, String, DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, bindparam, event, func, inspect, select
+from sqlalchemy.orm import relationship, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from datetime import datetime
-from . import Base, get_session
+from . import Base, content_hash, get_session, stream
+from .author_index import author_index
+from .sharding import router
+from .write_queue import copy_committed, queued_writes
 
 class Author(Base):
     __tablename__ = 'authors'
@@ -10,6 +14,10 @@ class Author(Base):
     name = Column(String(100), nullable=False)
     email = Column(String(100), unique=True, nullable=False)
     created_at = Column(DateTime, default=datetime.now)
+    # Digest of HASHED_COLUMNS, so catalog sync can skip unchanged rows
+    content_hash = Column(String(40))
+    
+    HASHED_COLUMNS = ("name", "email")
     
     # One-to-many relationship with books
     books = relationship("Book", back_populates="author", cascade="all, delete-orphan")
@@ -20,13 +28,16 @@ class Author(Base):
     @property
     def book_count(self):
         """Return the number of books by this author"""
+        # Use the collection if it was eager loaded instead of querying again
+        if "books" not in inspect(self).unloaded:
+            return len(self.books)
+        
         from .book import Book
-        session = get_session()
-        try:
-            count = session.query(Book).filter(Book.author_id == self.id).count()
-            return count
-        finally:
-            session.close()
+        return Book.count_by_author_id(self.id)
+    
+    def compute_content_hash(self):
+        """Return the digest of this author's synced columns"""
+        return content_hash(*(getattr(self, column) for column in self.HASHED_COLUMNS))
     
     @property
     def display_name(self):
@@ -37,6 +48,10 @@ class Author(Base):
     @classmethod
     def create(cls, name, email):
         """Create a new author"""
+        write_queue = queued_writes()
+        if write_queue:
+            return write_queue.create_author(name, email).result()
+        
         session = get_session()
         try:
             author = cls(name=name, email=email)
@@ -44,6 +59,7 @@ class Author(Base):
             session.commit()
             # Refresh the object to ensure it's properly loaded
             session.refresh(author)
+            author_index.add(author.id, author.name, author.email)
             return author
         except Exception as e:
             session.rollback()
@@ -61,11 +77,87 @@ class Author(Base):
             session.close()
     
     @classmethod
-    def find_by_id(cls, author_id):
-        """Find author by ID"""
+    def count(cls):
+        """Return the total number of authors"""
+        session = get_session()
+        try:
+            return session.query(func.count(cls.id)).scalar()
+        finally:
+            session.close()
+    
+    @classmethod
+    def most_prolific(cls):
+        """Return (author, book count) for the author with the most books, or None.
+
+        Ties go to the lowest author ID. Authors without books count as zero,
+        so any author is returned when there are no books at all.
+        """
+        from .book import Book
+        book_count = func.count(Book.id).label("book_count")
+        if router is None:
+            session = get_session()
+            try:
+                return session.execute(
+                    select(cls, book_count).outerjoin(cls.books).group_by(cls.id)
+                    .order_by(book_count.desc(), cls.id).limit(1)
+                ).first()
+            finally:
+                session.close()
+        
+        # An author's books are all on one shard, so each shard's top author is complete
+        tops = [top for top in router.scatter(lambda session: session.query(Book.author_id, book_count)
+                .group_by(Book.author_id).order_by(book_count.desc(), Book.author_id).first()) if top]
+        if tops:
+            author_id, count = min(tops, key=lambda top: (-top[1], top[0]))
+            return cls.find_by_id(author_id), count
         session = get_session()
         try:
-            return session.query(cls).filter(cls.id == author_id).first()
+            author = session.query(cls).order_by(cls.id).first()
+            return (author, 0) if author else None
+        finally:
+            session.close()
+    
+    @classmethod
+    def iter_all(cls):
+        """Stream all authors in chunks"""
+        return stream(select(cls).order_by(cls.id))
+    
+    @classmethod
+    def find_by_id(cls, author_id, with_books=False):
+        """Find author by ID, optionally with their books eager loaded"""
+        statement = _FIND_BY_ID
+        if with_books and router is None:
+            statement = statement.options(selectinload(cls.books))
+        session = get_session()
+        try:
+            author = session.execute(statement, {"author_id": author_id}).scalars().first()
+            if author and with_books:
+                _link_books([author])
+            return author
+        finally:
+            session.close()
+    
+    @classmethod
+    def find_many(cls, author_ids, with_books=False):
+        """Find several authors by ID in one query, optionally with their books.
+
+        With books, the authors and all of their books are fetched in two
+        queries in total (selectinload batches the IN list for very large sets;
+        in sharded mode the books query runs once per shard, in parallel).
+        """
+        author_ids = list(author_ids)
+        if not author_ids:
+            return []
+        
+        statement = _FIND_MANY
+        if with_books and router is None:
+            statement = statement.options(selectinload(cls.books))
+        session = get_session()
+        try:
+            authors = session.execute(statement, {"author_ids": author_ids}).scalars().all()
+            if with_books:
+                _link_books(authors)
+            return authors
         finally:
             session.close()
     
@@ -78,21 +170,42 @@ class Author(Base):
         finally:
             session.close()
     
+    @classmethod
+    def iter_by_name(cls, name):
+        """Stream authors whose name matches in chunks"""
+        return stream(select(cls).where(cls.name.ilike(f"%{name}%")).order_by(cls.id))
+    
+    @classmethod
+    def autocomplete(cls, prefix, limit=10):
+        """Return up to `limit` (id, name, email) matches for a name or email prefix"""
+        return author_index.search(prefix, limit)
+    
     @classmethod
     def find_by_email(cls, email):
         """Find author by email"""
         session = get_session()
         try:
-            return session.query(cls).filter(cls.email == email).first()
+            return session.execute(_FIND_BY_EMAIL, {"email": email}).scalars().first()
         finally:
             session.close()
     
     def delete(self):
         """Delete this author"""
+        write_queue = queued_writes()
+        if write_queue:
+            return write_queue.delete(Author, self.id).result()
+        
         session = get_session()
+        author_id = self.id
         try:
+            if router is not None:
+                # Books live on a shard, outside this session's cascade
+                from .book import Book
+                Book.delete_by_author_id(author_id)
+                set_committed_value(self, "books", [])
             session.delete(self)
             session.commit()
+            author_index.remove(author_id)
             return True
         except Exception as e:
             session.rollback()
@@ -102,6 +215,11 @@ class Author(Base):
     
     def update(self, name=None, email=None):
         """Update author information"""
+        write_queue = queued_writes()
+        if write_queue:
+            fields = {key: value for key, value in (("name", name), ("email", email)) if value}
+            return copy_committed(self, write_queue.update(Author, self.id, **fields).result())
+        
         session = get_session()
         try:
             if name:
@@ -110,9 +228,38 @@ class Author(Base):
                 self.email = email
             session.add(self)
             session.commit()
+            author_index.update(self.id, self.name, self.email)
             return self
         except Exception as e:
             session.rollback()
             raise e
         finally:
             session.close()
+
+@event.listens_for(Author, "before_insert")
+@event.listens_for(Author, "before_update")
+def _set_content_hash(mapper, connection, target):
+    target.content_hash = target.compute_content_hash()
+
+# Pre-built lookup statements; bound parameters keep their cache key stable
+# so each one is compiled once and then served from the engine's cache
+_FIND_BY_ID = select(Author).where(Author.id == bindparam("author_id"))
+_FIND_BY_EMAIL = select(Author).where(Author.email == bindparam("email"))
+_FIND_MANY = select(Author).where(
+    Author.id.in_(bindparam("author_ids", expanding=True))
+).order_by(Author.id)
+
+def _link_books(authors):
+    """Point each eager loaded book back at its author without another query"""
+    if router is not None:
+        # selectinload cannot reach across databases, so fetch from the shards
+        from .book import Book
+        books_by_author = {}
+        for book in Book.find_by_author_ids([author.id for author in authors]):
+            books_by_author.setdefault(book.author_id, []).append(book)
+        for author in authors:
+            set_committed_value(author, "books", books_by_author.get(author.id, []))
+    
+    for author in authors:
+        for book in author.books:
+            set_committed_value(book, "author", author)
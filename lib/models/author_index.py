@@ -0,0 +1,124 @@
+import bisect
+import threading
+from collections import namedtuple
+from . import get_session
+
+AuthorMatch = namedtuple("AuthorMatch", ["id", "name", "email"])
+
+
+class AuthorIndex:
+    """In-memory sorted prefix index over author names and emails"""
+
+    def __init__(self):
+        self._keys = []      # sorted list of (key, author_id)
+        self._authors = {}   # author_id -> AuthorMatch
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _keys_for(name, email):
+        """Return the lowercase keys an author can be found by"""
+        name = (name or "").lower()
+        keys = {name, (email or "").lower()}
+        # Also index every word of the name so "tolk" finds "J.R.R. Tolkien"
+        keys.update(name.split())
+        keys.discard("")
+        return keys
+
+    def _load(self):
+        """Build the index from a single projection query"""
+        from .author import Author
+        session = get_session()
+        try:
+            rows = session.query(Author.id, Author.name, Author.email).all()
+        finally:
+            session.close()
+
+        keys = []
+        authors = {}
+        for author_id, name, email in rows:
+            authors[author_id] = AuthorMatch(author_id, name, email)
+            keys.extend((key, author_id) for key in self._keys_for(name, email))
+        keys.sort()
+        self._keys = keys
+        self._authors = authors
+        self._loaded = True
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+
+    def _insert(self, author_id, name, email):
+        self._authors[author_id] = AuthorMatch(author_id, name, email)
+        for key in self._keys_for(name, email):
+            bisect.insort(self._keys, (key, author_id))
+
+    def _remove(self, author_id):
+        match = self._authors.pop(author_id, None)
+        if match is None:
+            return
+        for key in self._keys_for(match.name, match.email):
+            pos = bisect.bisect_left(self._keys, (key, author_id))
+            if pos < len(self._keys) and self._keys[pos] == (key, author_id):
+                del self._keys[pos]
+
+    def add(self, author_id, name, email):
+        """Register a newly created author"""
+        with self._lock:
+            # An unloaded index will pick the author up when it is built
+            if self._loaded:
+                self._remove(author_id)
+                self._insert(author_id, name, email)
+
+    def update(self, author_id, name, email):
+        """Re-index an author whose name or email changed"""
+        self.add(author_id, name, email)
+
+    def remove(self, author_id):
+        """Drop a deleted author from the index"""
+        with self._lock:
+            if self._loaded:
+                self._remove(author_id)
+
+    def reset(self):
+        """Forget everything; the index is rebuilt on next use"""
+        with self._lock:
+            self._keys = []
+            self._authors = {}
+            self._loaded = False
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._authors)
+
+    def get(self, author_id):
+        """Return the indexed entry for an author ID, or None"""
+        self._ensure_loaded()
+        return self._authors.get(author_id)
+
+    def search(self, prefix, limit=10):
+        """Return up to `limit` authors whose name, a name word or email starts with prefix"""
+        self._ensure_loaded()
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+
+        matches = []
+        seen = set()
+        with self._lock:
+            pos = bisect.bisect_left(self._keys, (prefix,))
+            while pos < len(self._keys) and len(matches) < limit:
+                key, author_id = self._keys[pos]
+                if not key.startswith(prefix):
+                    break
+                if author_id not in seen:
+                    seen.add(author_id)
+                    matches.append(self._authors[author_id])
+                pos += 1
+        return matches
+
+
+# Shared index used by the Author model and the CLI author picker
+author_index = AuthorIndex()
@@ -0,0 +1,134 @@
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy.engine import make_url
+from . import DATABASE_URL, engine
+from .sharding import router, shard_url
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', 'snapshots')
+
+SnapshotResult = namedtuple("SnapshotResult", ["path", "database_bytes", "file_bytes", "seconds"])
+
+def database_path(url=DATABASE_URL):
+    """Return the file path of a SQLite database URL"""
+    path = make_url(url).database
+    if not path or path == ":memory:":
+        raise ValueError("Snapshots need a file-based SQLite database")
+    return path
+
+def _copy_online(source_path, target_path):
+    """Write a consistent copy of source to target without blocking its writers.
+
+    VACUUM INTO reads the whole database inside one read transaction, so the
+    copy is a single point in time. In WAL mode, which create_tables puts
+    catalog databases in, that transaction doesn't stop other connections
+    from committing. The source's journal mode is left alone: any other file
+    is copied in the mode it has, and outside WAL its writers wait until the
+    copy is done.
+    """
+    if os.path.exists(target_path):
+        os.remove(target_path)
+    source = sqlite3.connect(source_path, isolation_level=None)
+    try:
+        source.execute("VACUUM INTO ?", (target_path,))
+    finally:
+        source.close()
+
+def _compress(path, compressed_path):
+    with open(path, "rb") as raw, gzip.open(compressed_path, "wb", compresslevel=6) as packed:
+        shutil.copyfileobj(raw, packed, 1024 * 1024)
+
+def snapshot_file(source_path, destination, compress=False):
+    """Snapshot one SQLite file while it stays open for writes"""
+    start = time.perf_counter()
+    copy_path = destination + ".partial" if compress else destination
+    _copy_online(source_path, copy_path)
+    database_bytes = os.path.getsize(copy_path)
+    if compress:
+        _compress(copy_path, destination)
+        os.remove(copy_path)
+    return SnapshotResult(
+        destination, database_bytes, os.path.getsize(destination), time.perf_counter() - start
+    )
+
+def create_snapshot(directory=None, compress=False):
+    """Snapshot the catalog (and every shard) into a timestamped file; return the results"""
+    directory = directory or SNAPSHOT_DIR
+    os.makedirs(directory, exist_ok=True)
+    source = database_path()
+    root, ext = os.path.splitext(os.path.basename(source))
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    destination = os.path.join(directory, f"{root}-{stamp}{ext or '.db'}")
+
+    sources = [(source, destination)]
+    if router:
+        for index in range(router.shard_count):
+            sources.append((
+                database_path(str(shard_url(DATABASE_URL, index))),
+                str(shard_url(f"sqlite:///{destination}", index).database)
+            ))
+
+    suffix = ".gz" if compress else ""
+    return [
+        snapshot_file(path, target + suffix, compress=compress)
+        for path, target in sources
+    ]
+
+def _restore_file(snapshot_path, target_path):
+    """Copy a snapshot over a live database file with the backup API"""
+    if snapshot_path.endswith(".gz"):
+        handle, plain_path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        with gzip.open(snapshot_path, "rb") as packed, open(plain_path, "wb") as raw:
+            shutil.copyfileobj(packed, raw, 1024 * 1024)
+    else:
+        plain_path = snapshot_path
+
+    try:
+        source = sqlite3.connect(plain_path)
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+    finally:
+        if plain_path != snapshot_path:
+            os.remove(plain_path)
+
+def restore_snapshot(snapshot_path):
+    """Replace the catalog (and every shard) with a snapshot; returns seconds taken"""
+    start = time.perf_counter()
+    compressed = snapshot_path.endswith(".gz")
+    plain = snapshot_path[:-3] if compressed else snapshot_path
+
+    targets = [(snapshot_path, database_path())]
+    if router:
+        for index in range(router.shard_count):
+            shard_snapshot = str(shard_url(f"sqlite:///{plain}", index).database)
+            targets.append((
+                shard_snapshot + (".gz" if compressed else ""),
+                database_path(str(shard_url(DATABASE_URL, index)))
+            ))
+
+    for path, _ in targets:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Snapshot file {path} not found")
+    for path, target in targets:
+        _restore_file(path, target)
+
+    # Drop pooled connections and cached state that predate the restore
+    engine.dispose()
+    if router:
+        for shard_engine in router.engines:
+            shard_engine.dispose()
+    from .author_index import author_index
+    author_index.reset()
+    from .mirror import mirror
+    mirror.reload()
+    return time.perf_counter() - start
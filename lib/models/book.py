@@ -1,7 +1,63 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, bindparam, event, func, insert, inspect, select
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
-from . import Base, get_session
+from . import Base, content_hash, get_session, stream
+from .journal import DELETE, INSERT, record_change
+from .sharding import router
+from .write_queue import copy_committed, queued_writes
+from collections import Counter
 from datetime import datetime
+import re
+
+# Books published within this many years count as recent
+RECENT_YEARS = 10
+
+def current_year():
+    """Return the current year; shared by Python checks and SQL expressions"""
+    return datetime.now().year
+
+# Earliest publication year a book can have
+MIN_PUBLICATION_YEAR = 1000
+
+def valid_isbn(isbn):
+    """Return True for a 10 or 13 digit ISBN, ignoring hyphens and spaces"""
+    digits = isbn if isbn.isdigit() else re.sub(r'[-\s]', '', isbn)
+    return len(digits) in (10, 13) and digits.isdigit()
+
+def valid_publication_year(year, this_year=None):
+    """Return True if year is between MIN_PUBLICATION_YEAR and this year.
+
+    Bulk checks can pass this_year in instead of reading the clock per row.
+    """
+    return MIN_PUBLICATION_YEAR <= year <= (this_year or current_year())
+
+def _session(author_id=None, book_id=None):
+    """Get a session on the database holding an author's books or a given book"""
+    if router is None:
+        return get_session()
+    if author_id is not None:
+        return router.session_for_author(author_id)
+    return router.session_for_book(book_id)
+
+def _scatter(query):
+    """Run query(session) on every database holding books; return per-database results"""
+    if router is not None:
+        return router.scatter(query)
+    session = get_session()
+    try:
+        return [query(session)]
+    finally:
+        session.close()
+
+def _gather(query):
+    """Run a list-returning query(session) everywhere and combine the rows"""
+    return [row for rows in _scatter(query) for row in rows]
+
+def _stream(statement):
+    """Stream a select() from every database holding books"""
+    if router is not None:
+        return router.stream(statement)
+    return stream(statement)
 
 class Book(Base):
     __tablename__ = 'books'
@@ -9,20 +65,34 @@ class Book(Base):
     id = Column(Integer, primary_key=True)
     title = Column(String(200), nullable=False)
     isbn = Column(String(13), unique=True, nullable=False)
-    publication_year = Column(Integer, nullable=False)
+    publication_year = Column(Integer, nullable=False, index=True)
     genre = Column(String(50), nullable=False)
     created_at = Column(DateTime, default=datetime.now)
     
     # Foreign key relationship with author
-    author_id = Column(Integer, ForeignKey('authors.id'), nullable=False)
+    author_id = Column(Integer, ForeignKey('authors.id'), nullable=False, index=True)
     author = relationship("Author", back_populates="books")
     
+    # See Author.content_hash
+    content_hash = Column(String(40))
+    
+    HASHED_COLUMNS = ("title", "isbn", "publication_year", "genre", "author_id")
+    
     def __repr__(self):
         return f"<Book(id={self.id}, title='{self.title}', author_id={self.author_id})>"
     
+    def compute_content_hash(self):
+        """Return the digest of this book's synced columns"""
+        return content_hash(*(getattr(self, column) for column in self.HASHED_COLUMNS))
+    
     @property
     def display_title(self):
         """Return formatted book title with author"""
+        # Reuse an author loaded alongside the book instead of querying for it
+        if "author" not in inspect(self).unloaded:
+            author = self.author
+            return f"{self.title} by {author.name if author else 'Unknown Author'}"
+        
         from .author import Author
         session = get_session()
         try:
@@ -31,22 +101,26 @@ class Book(Base):
         finally:
             session.close()
     
-    @property
+    @hybrid_property
     def is_recent(self):
         """Check if book was published in the last 10 years"""
-        current_year = datetime.now().year
-        return (current_year - self.publication_year) <= 10
+        return self.publication_year >= current_year() - RECENT_YEARS
     
-    @property
+    @hybrid_property
     def age(self):
         """Return the age of the book in years"""
-        current_year = datetime.now().year
-        return current_year - self.publication_year
+        return current_year() - self.publication_year
     
     # ORM Methods
     @classmethod
     def create(cls, title, isbn, publication_year, genre, author_id):
         """Create a new book"""
+        if router is not None:
+            return cls._create_on_shard(title, isbn, publication_year, genre, author_id)
+        write_queue = queued_writes()
+        if write_queue:
+            return write_queue.create_book(title, isbn, publication_year, genre, author_id).result()
+        
         session = get_session()
         try:
             book = cls(
@@ -68,62 +142,210 @@ class Book(Base):
             session.close()
     
     @classmethod
-    def get_all(cls):
-        """Get all books"""
-        session = get_session()
+    def _create_on_shard(cls, title, isbn, publication_year, genre, author_id):
+        """Insert a book on its author's shard with a shard-encoded ID"""
+        session = _session(author_id=author_id)
         try:
-            return session.query(cls).all()
+            result = session.execute(insert(cls.__table__).values(
+                id=router.next_book_id(author_id),
+                title=title,
+                isbn=isbn,
+                publication_year=publication_year,
+                genre=genre,
+                author_id=author_id,
+                # Core inserts skip the before_insert listener that sets this
+                content_hash=content_hash(title, isbn, publication_year, genre, author_id)
+            ))
+            # Not a flush, so journal explicitly (see journal.record_changes)
+            book = session.get(cls, result.lastrowid)
+            record_change(session, INSERT, book)
+            session.commit()
+            session.refresh(book)
+            return book
+        except Exception as e:
+            session.rollback()
+            raise e
         finally:
             session.close()
     
+    @classmethod
+    def get_all(cls):
+        """Get all books"""
+        return _gather(lambda session: session.query(cls).all())
+    
+    @classmethod
+    def count(cls):
+        """Return the total number of books"""
+        return sum(_scatter(lambda session: session.query(func.count(cls.id)).scalar()))
+    
+    @classmethod
+    def iter_all(cls):
+        """Stream all books in chunks"""
+        return _stream(select(cls).order_by(cls.id))
+    
     @classmethod
     def find_by_id(cls, book_id):
         """Find book by ID"""
-        session = get_session()
+        session = _session(book_id=book_id)
         try:
-            return session.query(cls).filter(cls.id == book_id).first()
+            return session.execute(_FIND_BY_ID, {"book_id": book_id}).scalars().first()
         finally:
             session.close()
     
     @classmethod
     def find_by_title(cls, title):
         """Find books by title"""
-        session = get_session()
-        try:
-            return session.query(cls).filter(cls.title.ilike(f"%{title}%")).all()
-        finally:
-            session.close()
+        return _gather(
+            lambda session: session.query(cls).filter(cls.title.ilike(f"%{title}%")).all()
+        )
+    
+    @classmethod
+    def iter_by_title(cls, title):
+        """Stream books whose title matches in chunks"""
+        return _stream(select(cls).where(cls.title.ilike(f"%{title}%")).order_by(cls.id))
     
     @classmethod
     def find_by_author_id(cls, author_id):
         """Find books by author ID"""
-        session = get_session()
+        session = _session(author_id=author_id)
         try:
-            return session.query(cls).filter(cls.author_id == author_id).all()
+            return session.execute(_FIND_BY_AUTHOR_ID, {"author_id": author_id}).scalars().all()
         finally:
             session.close()
     
     @classmethod
-    def find_by_genre(cls, genre):
-        """Find books by genre"""
-        session = get_session()
+    def find_by_author_ids(cls, author_ids):
+        """Find the books of several authors at once"""
+        author_ids = list(author_ids)
+        if not author_ids:
+            return []
+        books = _gather(lambda session: session.query(cls).filter(
+            cls.author_id.in_(author_ids)
+        ).order_by(cls.id).all())
+        if router is not None:
+            books.sort(key=lambda book: book.id)
+        return books
+    
+    @classmethod
+    def count_by_author_id(cls, author_id):
+        """Count an author's books"""
+        session = _session(author_id=author_id)
         try:
-            return session.query(cls).filter(cls.genre.ilike(f"%{genre}%")).all()
+            return session.query(func.count(cls.id)).filter(cls.author_id == author_id).scalar()
         finally:
             session.close()
     
     @classmethod
-    def find_by_isbn(cls, isbn):
-        """Find book by ISBN"""
-        session = get_session()
+    def delete_by_author_id(cls, author_id):
+        """Delete all of an author's books; returns the number deleted"""
+        session = _session(author_id=author_id)
         try:
-            return session.query(cls).filter(cls.isbn == isbn).first()
+            query = session.query(cls).filter(cls.author_id == author_id)
+            # Journal each row before the bulk delete (see journal.record_changes)
+            for book in query.yield_per(500):
+                record_change(session, DELETE, book)
+            deleted = query.delete()
+            session.commit()
+            return deleted
+        except Exception as e:
+            session.rollback()
+            raise e
         finally:
             session.close()
     
+    @classmethod
+    def iter_by_author_id(cls, author_id):
+        """Stream an author's books in chunks"""
+        statement = select(cls).where(cls.author_id == author_id).order_by(cls.id)
+        if router is not None:
+            return router.stream_shard(router.shard_for_author(author_id), statement)
+        return stream(statement)
+    
+    @classmethod
+    def find_by_genre(cls, genre):
+        """Find books by genre"""
+        return _gather(
+            lambda session: session.query(cls).filter(cls.genre.ilike(f"%{genre}%")).all()
+        )
+    
+    @classmethod
+    def iter_by_genre(cls, genre):
+        """Stream books whose genre matches in chunks"""
+        return _stream(select(cls).where(cls.genre.ilike(f"%{genre}%")).order_by(cls.id))
+    
+    @classmethod
+    def find_by_year_range(cls, start_year, end_year):
+        """Find books published between start_year and end_year (inclusive)"""
+        books = _gather(lambda session: session.query(cls).filter(
+            cls.publication_year.between(start_year, end_year)
+        ).order_by(cls.publication_year, cls.id).all())
+        if router is not None:
+            books.sort(key=lambda book: (book.publication_year, book.id))
+        return books
+    
+    @classmethod
+    def find_recent(cls):
+        """Find books published in the last 10 years, newest first"""
+        books = _gather(lambda session: session.query(cls).filter(cls.is_recent).order_by(
+            cls.publication_year.desc(), cls.id
+        ).all())
+        if router is not None:
+            books.sort(key=lambda book: (-book.publication_year, book.id))
+        return books
+    
+    @classmethod
+    def count_recent(cls):
+        """Count books published in the last 10 years"""
+        return sum(_scatter(
+            lambda session: session.query(func.count(cls.id)).filter(cls.is_recent).scalar()
+        ))
+    
+    @classmethod
+    def average_age(cls):
+        """Return the average book age in years, or None if there are no books"""
+        totals = _scatter(
+            lambda session: session.query(func.sum(cls.age), func.count(cls.id)).one()
+        )
+        age_sum = sum(total or 0 for total, _ in totals)
+        count = sum(count for _, count in totals)
+        return age_sum / count if count else None
+    
+    @classmethod
+    def count_by_genre(cls):
+        """Return (genre, count) pairs ordered by genre"""
+        counts = Counter()
+        for genre, count in _gather(
+            lambda session: session.query(cls.genre, func.count(cls.id)).group_by(cls.genre).all()
+        ):
+            counts[genre] += count
+        return sorted(counts.items())
+    
+    @classmethod
+    def count_by_decade(cls):
+        """Return (decade, count) pairs ordered by decade"""
+        decade = (cls.publication_year // 10 * 10).label("decade")
+        counts = Counter()
+        for decade_value, count in _gather(
+            lambda session: session.query(decade, func.count(cls.id)).group_by(decade).all()
+        ):
+            counts[decade_value] += count
+        return sorted(counts.items())
+    
+    @classmethod
+    def find_by_isbn(cls, isbn):
+        """Find book by ISBN"""
+        books = _gather(
+            lambda session: session.execute(_FIND_BY_ISBN, {"isbn": isbn}).scalars().all()
+        )
+        return books[0] if books else None
+    
     def delete(self):
         """Delete this book"""
-        session = get_session()
+        write_queue = queued_writes()
+        if write_queue:
+            return write_queue.delete(Book, self.id).result()
+        
+        session = _session(book_id=self.id)
         try:
             session.delete(self)
             session.commit()
@@ -136,7 +358,22 @@ class Book(Base):
     
     def update(self, title=None, isbn=None, publication_year=None, genre=None, author_id=None):
         """Update book information"""
-        session = get_session()
+        if router is not None and author_id and (
+            router.shard_for_author(author_id) != router.shard_for_book(self.id)
+        ):
+            raise ValueError("Cannot move a book to an author on a different shard")
+        
+        write_queue = queued_writes()
+        if write_queue:
+            fields = {
+                key: value for key, value in (
+                    ("title", title), ("isbn", isbn), ("publication_year", publication_year),
+                    ("genre", genre), ("author_id", author_id)
+                ) if value
+            }
+            return copy_committed(self, write_queue.update(Book, self.id, **fields).result())
+        
+        session = _session(book_id=self.id)
         try:
             if title:
                 self.title = title
@@ -156,3 +393,13 @@ class Book(Base):
             raise e
         finally:
             session.close()
+
+@event.listens_for(Book, "before_insert")
+@event.listens_for(Book, "before_update")
+def _set_content_hash(mapper, connection, target):
+    target.content_hash = target.compute_content_hash()
+
+# Pre-built lookup statements, cached the same way as in author.py
+_FIND_BY_ID = select(Book).where(Book.id == bindparam("book_id"))
+_FIND_BY_ISBN = select(Book).where(Book.isbn == bindparam("isbn"))
+_FIND_BY_AUTHOR_ID = select(Book).where(Book.author_id == bindparam("author_id")).order_by(Book.id)
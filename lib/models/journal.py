@@ -0,0 +1,186 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, and_, event, func, insert, inspect, select
+from sqlalchemy.orm import Session as OrmSession
+from datetime import datetime
+from . import Base, get_session, stream
+from .sharding import router
+import json
+import os
+
+# Set CHANGE_JOURNAL=0 to stop recording changes
+JOURNAL_ENABLED = os.environ.get('CHANGE_JOURNAL', '1') != '0'
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+TRUNCATE = "truncate"
+
+class ChangeEvent(Base):
+    __tablename__ = 'change_journal'
+
+    # AUTOINCREMENT keeps sequence numbers monotonic even after compaction
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    table_name = Column(String(50), nullable=False)
+    row_id = Column(Integer)
+    operation = Column(String(10), nullable=False)
+    row_image = Column(Text)
+    created_at = Column(DateTime, default=datetime.now)
+
+    __table_args__ = (
+        Index('ix_change_journal_row', 'table_name', 'row_id', 'seq'),
+        {'sqlite_autoincrement': True},
+    )
+
+    def __repr__(self):
+        return f"<ChangeEvent(seq={self.seq}, {self.operation} {self.table_name}:{self.row_id})>"
+
+    def to_dict(self):
+        """Return the event as a JSON-serializable dict"""
+        return {
+            "seq": self.seq,
+            "table": self.table_name,
+            "op": self.operation,
+            "id": self.row_id,
+            "row": json.loads(self.row_image) if self.row_image else None,
+            "at": self.created_at.isoformat() if self.created_at else None,
+        }
+
+def _row_image(obj):
+    """Return the loaded column values of a mapped object"""
+    state = inspect(obj)
+    return {
+        attr.key: state.dict[attr.key]
+        for attr in state.mapper.column_attrs
+        if attr.key in state.dict
+    }
+
+def _change_row(operation, obj):
+    mapper = inspect(obj).mapper
+    return {
+        "table_name": obj.__tablename__,
+        "row_id": mapper.primary_key_from_instance(obj)[0],
+        "operation": operation,
+        "row_image": json.dumps(_row_image(obj), default=str),
+        "created_at": datetime.now(),
+    }
+
+def record_change(session, operation, obj):
+    """Journal one row change on the session's connection, inside its transaction"""
+    record_changes(session, operation, [obj])
+
+def record_changes(session, operation, objs):
+    """Journal many row changes of one kind with a single executemany.
+
+    The after_flush hook below only sees changes made through the unit of
+    work. Core inserts and bulk UPDATE/DELETE statements bypass it, so code
+    that uses them calls this (or record_change/record_truncate) itself.
+    """
+    if not JOURNAL_ENABLED:
+        return
+    rows = [_change_row(operation, obj) for obj in objs]
+    if rows:
+        session.connection().execute(insert(ChangeEvent.__table__), rows)
+
+def record_truncate(session, model):
+    """Journal that every row of a table was removed"""
+    if not JOURNAL_ENABLED:
+        return
+    session.connection().execute(insert(ChangeEvent.__table__).values(
+        table_name=model.__tablename__,
+        operation=TRUNCATE,
+        created_at=datetime.now()
+    ))
+
+@event.listens_for(OrmSession, "after_flush")
+def _journal_flush(session, flush_context):
+    """Record inserts, updates and deletes made by a flush in the same transaction"""
+    if not JOURNAL_ENABLED:
+        return
+    record_changes(session, INSERT, [
+        obj for obj in session.new if not isinstance(obj, ChangeEvent)
+    ])
+    record_changes(session, UPDATE, [
+        obj for obj in session.dirty
+        if not isinstance(obj, ChangeEvent) and session.is_modified(obj, include_collections=False)
+    ])
+    record_changes(session, DELETE, [
+        obj for obj in session.deleted if not isinstance(obj, ChangeEvent)
+    ])
+
+def _open_session(shard=None):
+    """Get a session on the main database, or on one shard in sharded mode.
+
+    Each database keeps its own journal: authors in the main one, books on
+    the shard that holds them, so sequence numbers are per database.
+    """
+    if shard is None:
+        return get_session()
+    return router.session(shard)
+
+def iter_changes(since=0, shard=None):
+    """Stream journal events with seq > since in sequence order"""
+    statement = select(ChangeEvent).where(ChangeEvent.seq > since).order_by(ChangeEvent.seq)
+    if shard is None:
+        return stream(statement)
+    return router.stream_shard(shard, statement)
+
+def latest_seq(shard=None):
+    """Return the highest sequence number written so far, or 0"""
+    session = _open_session(shard)
+    try:
+        return session.query(func.max(ChangeEvent.seq)).scalar() or 0
+    finally:
+        session.close()
+
+def _compaction_deletes(upto=None):
+    """Return the DELETE statements compact() runs, truncations first.
+
+    Both walk ix_change_journal_row: one aggregate finds the newest seq per
+    row (and per table for truncates), then older events are looked up by
+    (table_name, row_id, seq) instead of comparing every pair of events.
+    """
+    journal = ChangeEvent.__table__
+    older = journal.alias("older")
+
+    last_truncate = select(
+        journal.c.table_name, func.max(journal.c.seq).label("seq")
+    ).where(
+        journal.c.row_id.is_(None), journal.c.operation == TRUNCATE
+    ).group_by(journal.c.table_name).subquery("last_truncate")
+    before_truncate = select(older.c.seq).join(last_truncate, and_(
+        older.c.table_name == last_truncate.c.table_name,
+        older.c.seq < last_truncate.c.seq
+    ))
+
+    latest = select(
+        journal.c.table_name, journal.c.row_id, func.max(journal.c.seq).label("seq")
+    ).group_by(journal.c.table_name, journal.c.row_id).subquery("latest")
+    superseded = select(older.c.seq).join(latest, and_(
+        older.c.table_name == latest.c.table_name,
+        older.c.row_id == latest.c.row_id,
+        older.c.seq < latest.c.seq
+    ))
+
+    statements = []
+    for doomed in (before_truncate, superseded):
+        if upto is not None:
+            doomed = doomed.where(older.c.seq <= upto)
+        statements.append(journal.delete().where(journal.c.seq.in_(doomed)))
+    return statements
+
+def compact(upto=None, shard=None):
+    """Drop events superseded by a later event for the same row or a later truncate.
+
+    Only events with seq <= upto (default: everything) are considered. The
+    newest event for every row is kept, so replaying the compacted journal
+    still ends in the same state. Returns the number of events removed.
+    """
+    session = _open_session(shard)
+    try:
+        removed = sum(session.execute(statement).rowcount for statement in _compaction_deletes(upto))
+        session.commit()
+        return removed
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
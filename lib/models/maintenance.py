@@ -0,0 +1,240 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import Column, Integer, Float, String, DateTime, func, insert
+from . import Base, engine, get_session
+from .sharding import router
+import os
+import time
+
+# Hours between scheduled maintenance runs at startup; 0 disables the schedule
+MAINTENANCE_INTERVAL_HOURS = float(os.environ.get('MAINTENANCE_INTERVAL_HOURS', '24'))
+# Free pages released per incremental vacuum step
+VACUUM_STEP_PAGES = int(os.environ.get('VACUUM_STEP_PAGES', '512'))
+# Most incremental vacuum steps in one run, so a run never holds the write lock for long
+VACUUM_MAX_STEPS = int(os.environ.get('VACUUM_MAX_STEPS', '64'))
+# Rows ANALYZE samples per index; keeps statistics refreshes cheap on big tables
+ANALYSIS_LIMIT = int(os.environ.get('ANALYSIS_LIMIT', '1000'))
+
+# PRAGMA auto_vacuum value for incremental mode
+AUTO_VACUUM_INCREMENTAL = 2
+# MaintenanceResult.vacuum for a file that still needs its one-time full VACUUM
+CONVERSION_NEEDED = "conversion needed"
+
+MaintenanceResult = namedtuple("MaintenanceResult", [
+    "database", "bytes_before", "bytes_after", "pages_freed", "free_pages_left",
+    "vacuum", "integrity", "seconds"
+])
+
+class MaintenanceRun(Base):
+    __tablename__ = 'maintenance_runs'
+
+    id = Column(Integer, primary_key=True)
+    started_at = Column(DateTime, nullable=False)
+    seconds = Column(Float)
+    bytes_before = Column(Integer)
+    bytes_after = Column(Integer)
+    integrity = Column(String(200))
+
+    def __repr__(self):
+        return f"<MaintenanceRun(id={self.id}, started_at={self.started_at}, integrity='{self.integrity}')>"
+
+def _pragma(cursor, statement):
+    cursor.execute(f"PRAGMA {statement}")
+    return cursor.fetchall()
+
+def _value(cursor, statement):
+    return _pragma(cursor, statement)[0][0]
+
+def _databases():
+    """Return (name, engine) for the main database and every shard"""
+    databases = [("main", engine)]
+    if router:
+        databases += [(f"shard{index}", shard_engine) for index, shard_engine in enumerate(router.engines)]
+    return databases
+
+def use_incremental_vacuum(bind):
+    """Turn on auto_vacuum=INCREMENTAL for a database that has no tables yet.
+
+    The mode can only be set before the first table exists; older files are
+    converted on demand with maintain(convert=True).
+    """
+    connection = bind.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if _value(cursor, "page_count") == 0:
+            cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.close()
+    finally:
+        connection.close()
+
+def use_wal(bind):
+    """Put a database file in WAL mode, where readers and the writer don't block each other.
+
+    The mode is stored in the file, so this only changes anything once. Online
+    snapshots rely on it: their read transaction would otherwise hold off
+    every commit until the copy is done.
+    """
+    connection = bind.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.close()
+    finally:
+        connection.close()
+
+def _refresh_statistics(cursor):
+    cursor.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+    cursor.execute("ANALYZE")
+
+def refresh_statistics(bind=None):
+    """Re-run ANALYZE so the query planner sees the current row counts.
+
+    Called after bulk inserts and deletes. PRAGMA optimize only looks at
+    tables queried on the same connection, which after a bulk load through
+    the pool is usually none of them, so this runs a sampled ANALYZE instead.
+    """
+    binds = [bind] if bind else [database for _, database in _databases()]
+    for database in binds:
+        connection = database.raw_connection()
+        try:
+            cursor = connection.cursor()
+            _refresh_statistics(cursor)
+            cursor.close()
+            connection.commit()
+        finally:
+            connection.close()
+
+def _vacuum_step(cursor, pages):
+    """Release up to `pages` free pages in one transaction; returns how many are left"""
+    free = _value(cursor, "freelist_count")
+    if not free:
+        return 0
+    # incremental_vacuum frees one page per sqlite3_step() and Python's
+    # driver only steps a row-less statement once, so issue it per page
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        for _ in range(min(pages, free)):
+            cursor.execute("PRAGMA incremental_vacuum(1)")
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    return _value(cursor, "freelist_count")
+
+def maintain(bind, name="main", step_pages=None, max_steps=None, convert=False):
+    """Check, vacuum and analyze one database; returns a MaintenanceResult.
+
+    A file created before incremental auto_vacuum is only converted when
+    convert is true, since that takes a full VACUUM holding the write lock
+    for as long as rewriting the whole file takes. Otherwise its vacuum is
+    reported as CONVERSION_NEEDED.
+    """
+    step_pages = step_pages or VACUUM_STEP_PAGES
+    max_steps = VACUUM_MAX_STEPS if max_steps is None else max_steps
+
+    start = time.perf_counter()
+    connection = bind.raw_connection()
+    try:
+        cursor = connection.cursor()
+        page_size = _value(cursor, "page_size")
+        bytes_before = _value(cursor, "page_count") * page_size
+        free_before = _value(cursor, "freelist_count")
+
+        problems = [row[0] for row in _pragma(cursor, "quick_check")]
+        integrity = "ok" if problems == ["ok"] else "; ".join(problems)
+
+        # Never rewrite pages of a database that failed its integrity check
+        vacuum = "skipped"
+        if integrity == "ok":
+            if _value(cursor, "auto_vacuum") != AUTO_VACUUM_INCREMENTAL:
+                vacuum = CONVERSION_NEEDED
+                if convert:
+                    # Switching modes takes one full VACUUM to rebuild the file
+                    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                    cursor.execute("VACUUM")
+                    vacuum = "full"
+            else:
+                for _ in range(max_steps):
+                    if not _vacuum_step(cursor, step_pages):
+                        break
+                vacuum = "incremental"
+            _refresh_statistics(cursor)
+            connection.commit()
+
+        bytes_after = _value(cursor, "page_count") * page_size
+        free_after = _value(cursor, "freelist_count")
+        cursor.close()
+    finally:
+        connection.close()
+
+    return MaintenanceResult(
+        name, bytes_before, bytes_after, max(free_before - free_after, 0), free_after,
+        vacuum, integrity, time.perf_counter() - start
+    )
+
+def pending_conversions():
+    """Return the names of databases that still need the one-time full VACUUM"""
+    pending = []
+    for name, database in _databases():
+        connection = database.raw_connection()
+        try:
+            cursor = connection.cursor()
+            if _value(cursor, "auto_vacuum") != AUTO_VACUUM_INCREMENTAL:
+                pending.append(name)
+            cursor.close()
+        finally:
+            connection.close()
+    return pending
+
+def run_maintenance(step_pages=None, max_steps=None, convert=False):
+    """Maintain the main database and every shard, and log the run; returns the results"""
+    started_at = datetime.now()
+    results = [
+        maintain(database, name, step_pages, max_steps, convert)
+        for name, database in _databases()
+    ]
+
+    problems = [f"{r.database}: {r.integrity}" for r in results if r.integrity != "ok"]
+    session = get_session()
+    try:
+        # A Core insert keeps the log out of the change journal
+        session.execute(insert(MaintenanceRun.__table__).values(
+            started_at=started_at,
+            seconds=sum(r.seconds for r in results),
+            bytes_before=sum(r.bytes_before for r in results),
+            bytes_after=sum(r.bytes_after for r in results),
+            integrity=("; ".join(problems) or "ok")[:200]
+        ))
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+    return results
+
+def last_run():
+    """Return when maintenance last ran, or None"""
+    session = get_session()
+    try:
+        return session.query(func.max(MaintenanceRun.started_at)).scalar()
+    finally:
+        session.close()
+
+def is_due(now=None):
+    """Whether the scheduled maintenance interval has passed"""
+    if MAINTENANCE_INTERVAL_HOURS <= 0:
+        return False
+    previous = last_run()
+    now = now or datetime.now()
+    return previous is None or now - previous >= timedelta(hours=MAINTENANCE_INTERVAL_HOURS)
+
+def run_if_due():
+    """Run maintenance when the schedule says so; returns the results or None.
+
+    Scheduled runs never convert a file to incremental auto_vacuum; they
+    report CONVERSION_NEEDED and leave the full VACUUM to an explicit run.
+    """
+    if not is_due():
+        return None
+    return run_maintenance()
@@ -0,0 +1,169 @@
+from collections import namedtuple
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from . import QUERY_CACHE_SIZE, _record_cache_use, engine, use_read_engine
+from .sharding import router
+import os
+import sqlite3
+import threading
+import time
+
+# Databases bigger than this are not mirrored; reads stay on disk (megabytes)
+MIRROR_MAX_MB = float(os.environ.get('MIRROR_MAX_MB', '256'))
+
+MirrorLoad = namedtuple("MirrorLoad", ["loaded", "database_bytes", "seconds", "reason"])
+
+_WRITES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+class Mirror:
+    """In-memory copy of the main database that serves reads while writes go to both.
+
+    The copy is loaded with SQLite's backup API into a shared-cache memory
+    database. Sessions send SELECTs to it; every INSERT/UPDATE/DELETE that
+    runs on the disk engine is held back until that transaction commits and
+    then replayed on the copy and committed there, just before the file
+    commits. A rolled-back transaction never reaches the copy. Until it
+    commits, the session that wrote reads from the file instead (see
+    CatalogSession), so it still sees its own writes.
+
+    Reader connections use read_uncommitted, because shared-cache readers
+    would otherwise fail on the writer's table locks. Since the copy only
+    receives committing transactions, that can't show another session's
+    unfinished work, but a read that runs during a replay can see part of
+    the transaction being applied. If a replay or a disk commit fails, the
+    copy is dropped and reads go back to disk.
+
+    The mirror only sees this process's writes, so it is meant for a single
+    CLI process owning the database; other processes writing the same file
+    would not show up in it.
+    """
+
+    def __init__(self, bind=engine, max_bytes=None):
+        self.disk = bind
+        self.max_bytes = max_bytes or MIRROR_MAX_MB * 1024 * 1024
+        self.engine = None
+        self.dropped_reason = None
+        self._writer = None
+        self._uri = None
+        self._lock = threading.RLock()
+
+    @property
+    def active(self):
+        return self.engine is not None
+
+    def load(self):
+        """Copy the database into memory and route reads to it; returns a MirrorLoad"""
+        if self.active:
+            self.drop()
+        if router:
+            return MirrorLoad(False, 0, 0.0, "sharded mode keeps books in several files")
+        path = make_url(str(self.disk.url)).database
+        if not path or path == ":memory:" or not os.path.exists(path):
+            return MirrorLoad(False, 0, 0.0, "the database is not a SQLite file")
+        size = os.path.getsize(path)
+        if size > self.max_bytes:
+            return MirrorLoad(
+                False, size, 0.0,
+                f"the database is {size / 1024 / 1024:.1f} MB, over the "
+                f"{self.max_bytes / 1024 / 1024:.0f} MB mirror limit"
+            )
+
+        start = time.perf_counter()
+        self._uri = f"file:library-mirror-{os.getpid()}-{id(self)}?mode=memory&cache=shared"
+        # The writer keeps the shared memory database alive and owns its transactions
+        writer = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+        source = sqlite3.connect(path)
+        try:
+            source.backup(writer)
+        except Exception:
+            writer.close()
+            raise
+        finally:
+            source.close()
+
+        reader = create_engine("sqlite://", creator=self._connect_reader,
+                               query_cache_size=QUERY_CACHE_SIZE)
+        event.listen(reader, "before_cursor_execute", _record_cache_use)
+        with self._lock:
+            self._writer = writer
+            self.engine = reader
+            self.dropped_reason = None
+            self._listen(True)
+            use_read_engine(reader)
+        return MirrorLoad(True, size, time.perf_counter() - start, None)
+
+    def drop(self, reason=None):
+        """Stop serving reads from memory and free the copy"""
+        with self._lock:
+            if not self.active:
+                return
+            use_read_engine(None)
+            self._listen(False)
+            reader, writer = self.engine, self._writer
+            self.engine = self._writer = None
+            self.dropped_reason = reason
+        reader.dispose()
+        writer.close()
+
+    def reload(self):
+        """Reload the copy after the file was replaced underneath it (e.g. a restore)"""
+        if self.active:
+            return self.load()
+        return None
+
+    def _connect_reader(self):
+        connection = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+        # Shared-cache readers would otherwise hit table locks held by the writer
+        connection.execute("PRAGMA read_uncommitted = 1")
+        connection.execute("PRAGMA query_only = 1")
+        return connection
+
+    def _listen(self, on):
+        toggle = event.listen if on else event.remove
+        toggle(self.disk, "begin", self._on_begin)
+        toggle(self.disk, "after_cursor_execute", self._on_execute)
+        toggle(self.disk, "commit", self._on_commit)
+        toggle(self.disk, "rollback", self._on_rollback)
+        toggle(self.disk, "handle_error", self._on_error)
+
+    def _on_begin(self, conn):
+        conn.info.pop("mirror_committed", None)
+        conn.info.pop("mirror_writes", None)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active and statement.lstrip()[:7].upper().startswith(_WRITES):
+            conn.info.setdefault("mirror_writes", []).append((statement, parameters, executemany))
+
+    def _on_commit(self, conn):
+        writes = conn.info.pop("mirror_writes", None)
+        if not writes:
+            return
+        with self._lock:
+            if not self.active:
+                return
+            try:
+                for statement, parameters, executemany in writes:
+                    if executemany:
+                        self._writer.executemany(statement, parameters).fetchall()
+                    else:
+                        # Fetch so INSERT ... RETURNING runs to completion
+                        self._writer.execute(statement, parameters).fetchall()
+                self._writer.commit()
+                conn.info["mirror_committed"] = True
+            except Exception as e:
+                self._writer.rollback()
+                self.drop(f"replaying a write failed: {e}")
+
+    def _on_rollback(self, conn):
+        # Nothing reached the copy yet
+        conn.info.pop("mirror_writes", None)
+
+    def _on_error(self, context):
+        # The commit event fires before the file commits; if that then fails,
+        # the copy already holds writes the file doesn't
+        connection = context.connection
+        if context.statement is None and connection is not None \
+                and connection.info.pop("mirror_committed", False):
+            self.drop(f"the disk commit failed: {context.original_exception}")
+
+mirror = Mirror()
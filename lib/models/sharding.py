@@ -0,0 +1,193 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from sqlalchemy import create_engine, delete, event, func, insert, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+from . import Base, DATABASE_URL, STREAM_CHUNK_SIZE, _record_cache_use, add_missing_columns, engine_options
+import os
+
+# Number of SQLite files books are partitioned across; 0 or 1 disables sharding
+SHARD_COUNT = int(os.environ.get('LIBRARY_SHARDS', '0'))
+
+def shard_url(base_url, index):
+    """Return the URL of shard `index`, e.g. library.db -> library.shard0.db"""
+    url = make_url(base_url)
+    if not url.database or url.database == ":memory:":
+        return url
+    root, ext = os.path.splitext(url.database)
+    return url.set(database=f"{root}.shard{index}{ext or '.db'}")
+
+
+class ShardRouter:
+    """Routes book reads and writes across N SQLite files partitioned by author_id.
+
+    Authors stay in the main database, which acts as the author directory:
+    an author's books live on shard ``author_id % N``. Book IDs are allocated
+    so that ``book_id % N`` is the shard holding the book, which lets lookups
+    by ID go straight to one file. Finders that cannot be routed run on every
+    shard in parallel and merge the results.
+    """
+
+    def __init__(self, shard_count, base_url=DATABASE_URL):
+        self.shard_count = shard_count
+        self.engines = []
+        for index in range(shard_count):
+            url = shard_url(base_url, index)
+            engine = create_engine(url, **engine_options(url))
+            event.listen(engine, "before_cursor_execute", _record_cache_use)
+            self.engines.append(engine)
+        self._sessionmakers = [sessionmaker(bind=engine) for engine in self.engines]
+        self._executor = ThreadPoolExecutor(max_workers=shard_count, thread_name_prefix="shard")
+
+    def shard_for_author(self, author_id):
+        """Return the shard index holding an author's books"""
+        return author_id % self.shard_count
+
+    def shard_for_book(self, book_id):
+        """Return the shard index holding a book"""
+        return book_id % self.shard_count
+
+    def session(self, shard):
+        """Get a new session on one shard"""
+        return self._sessionmakers[shard]()
+
+    def session_for_author(self, author_id):
+        return self.session(self.shard_for_author(author_id))
+
+    def session_for_book(self, book_id):
+        return self.session(self.shard_for_book(book_id))
+
+    def create_tables(self):
+        """Create the books and change journal tables on every shard"""
+        from .book import Book
+        from .journal import ChangeEvent
+        from .maintenance import use_incremental_vacuum, use_wal
+        tables = [Book.__table__, ChangeEvent.__table__]
+        for engine in self.engines:
+            use_incremental_vacuum(engine)
+            use_wal(engine)
+            Base.metadata.create_all(engine, tables=tables)
+            add_missing_columns(engine, tables)
+            for table in tables:
+                for index in table.indexes:
+                    index.create(engine, checkfirst=True)
+
+    def move_books_from(self, bind, batch_size=1000):
+        """Move books left in an unsharded database onto their authors' shards.
+
+        Books written before sharding was turned on stay in the main file,
+        where no sharded finder looks, so they are moved on startup. A book
+        keeps its ID when that already points at its author's shard and gets
+        a new shard-encoded one otherwise. Each batch is journaled as deletes
+        on the main database and inserts on the shards; a rerun after a crash
+        skips ISBNs already on their shard. Returns the number of books moved.
+        """
+        from .book import Book
+        from .journal import DELETE, record_changes
+        books = Book.__table__
+        keeps_id = books.c.id % self.shard_count == books.c.author_id % self.shard_count
+        open_main = sessionmaker(bind=bind)
+        moved = 0
+        # IDs that are kept go first, so allocated ones (MAX(id) + N) never collide with them
+        for keep_ids, condition in ((True, keeps_id), (False, ~keeps_id)):
+            while True:
+                main = open_main()
+                try:
+                    rows = main.execute(
+                        select(books).where(condition).order_by(books.c.id).limit(batch_size)
+                    ).mappings().all()
+                    if not rows:
+                        break
+                    by_shard = {}
+                    for row in rows:
+                        by_shard.setdefault(self.shard_for_author(row["author_id"]), []).append(dict(row))
+                    for shard, group in by_shard.items():
+                        moved += self._insert_moved_books(shard, group, keep_ids)
+                    record_changes(main, DELETE, [Book(**row) for row in rows])
+                    main.execute(delete(books).where(books.c.id.in_([row["id"] for row in rows])))
+                    main.commit()
+                except Exception as e:
+                    main.rollback()
+                    raise e
+                finally:
+                    main.close()
+        return moved
+
+    def _insert_moved_books(self, shard, rows, keep_ids):
+        from .book import Book
+        from .journal import INSERT, record_changes
+        books = Book.__table__
+        session = self.session(shard)
+        try:
+            present = set(session.scalars(
+                select(books.c.isbn).where(books.c.isbn.in_([row["isbn"] for row in rows]))
+            ))
+            inserted = []
+            for row in rows:
+                if row["isbn"] in present:
+                    continue
+                if not keep_ids:
+                    row["id"] = self.next_book_id(row["author_id"])
+                result = session.execute(insert(books).values(**row))
+                inserted.append(Book(**dict(row, id=result.lastrowid)))
+            record_changes(session, INSERT, inserted)
+            session.commit()
+            return len(inserted)
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+
+    def next_book_id(self, author_id):
+        """Return a SQL expression for the next book ID on the author's shard.
+
+        IDs on shard k are k + N, k + 2N, ...; evaluating MAX(id) inside the
+        INSERT keeps allocation atomic under the shard's write lock.
+        """
+        from .book import Book
+        shard = self.shard_for_author(author_id)
+        return select(
+            func.coalesce(func.max(Book.id), shard) + self.shard_count
+        ).scalar_subquery()
+
+    def scatter(self, query):
+        """Run query(session) on every shard in parallel; return per-shard results"""
+        def run(shard):
+            session = self.session(shard)
+            try:
+                return query(session)
+            finally:
+                session.close()
+        return list(self._executor.map(run, range(self.shard_count)))
+
+    def gather(self, query):
+        """Scatter a query that returns lists and concatenate the results"""
+        return list(chain.from_iterable(self.scatter(query)))
+
+    def stream_shard(self, shard, statement, chunk_size=None):
+        """Stream a select() from one shard, one chunk at a time"""
+        session = self.session(shard)
+        try:
+            result = session.execute(
+                statement.execution_options(yield_per=chunk_size or STREAM_CHUNK_SIZE)
+            ).scalars()
+            for obj in result:
+                yield obj
+        finally:
+            session.close()
+
+    def stream(self, statement, chunk_size=None):
+        """Stream a select() from each shard in turn"""
+        for shard in range(self.shard_count):
+            yield from self.stream_shard(shard, statement, chunk_size)
+
+    def dispose(self):
+        """Shut down the worker pool and close all shard connections"""
+        self._executor.shutdown(wait=True)
+        for engine in self.engines:
+            engine.dispose()
+
+
+# Process-wide router, or None when the catalog lives in a single file
+router = ShardRouter(SHARD_COUNT) if SHARD_COUNT > 1 else None
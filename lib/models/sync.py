@@ -0,0 +1,375 @@
+from collections import namedtuple
+from sqlalchemy import delete, insert, select, update
+from . import content_hash, engine, get_session
+from .author import Author
+from .author_index import author_index
+from .book import MIN_PUBLICATION_YEAR, Book, current_year, valid_isbn, valid_publication_year
+from .journal import DELETE, INSERT, UPDATE, record_changes
+from .sharding import router
+import csv
+import json
+import os
+import time
+
+# Rows written per transaction while applying a sync
+SYNC_BATCH_SIZE = int(os.environ.get('SYNC_BATCH_SIZE', '1000'))
+
+SOURCE_FIELDS = ("author_name", "author_email", "title", "isbn", "publication_year", "genre")
+BOOK_FIELDS = ("title", "isbn", "publication_year", "genre")
+
+SyncResult = namedtuple("SyncResult", ["plan", "seconds"])
+
+# backfill: the row had no content_hash yet and digest was computed from its columns
+_StoredRow = namedtuple("_StoredRow", ["id", "digest", "author_id", "backfill"])
+
+class SyncPlan:
+    """The inserts, updates and deletes that bring the catalog in line with a source file.
+
+    Authors are keyed by email and books by ISBN. A row is only touched when
+    the digest of its incoming content differs from the stored content_hash.
+    Rows written before content_hash existed get their hash stored
+    (author_backfills, book_backfills) so later plans don't recompute it.
+    """
+
+    def __init__(self):
+        self.author_inserts = []
+        self.author_updates = []
+        self.author_deletes = []
+        self.book_inserts = []
+        self.book_updates = []
+        self.book_deletes = []
+        self.author_backfills = []
+        self.book_backfills = []
+        self.unchanged_authors = 0
+        self.unchanged_books = 0
+
+    @property
+    def changes(self):
+        """Total number of rows the plan writes"""
+        return sum(len(rows) for rows in (
+            self.author_inserts, self.author_updates, self.author_deletes,
+            self.book_inserts, self.book_updates, self.book_deletes
+        ))
+
+    def summary(self):
+        """Return the row counts per table and operation"""
+        return {
+            "authors": {
+                "insert": len(self.author_inserts),
+                "update": len(self.author_updates),
+                "delete": len(self.author_deletes),
+                "unchanged": self.unchanged_authors,
+            },
+            "books": {
+                "insert": len(self.book_inserts),
+                "update": len(self.book_updates),
+                "delete": len(self.book_deletes),
+                "unchanged": self.unchanged_books,
+            },
+        }
+
+def read_source(path):
+    """Yield one dict per line of a .csv or .jsonl catalog file.
+
+    Each record has SOURCE_FIELDS; a record without an ISBN only describes
+    an author.
+    """
+    with open(path, newline="", encoding="utf-8") as handle:
+        if path.endswith((".jsonl", ".json")):
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            # Cheaper than csv.DictReader, which checks every row's length
+            reader = csv.reader(handle)
+            header = next(reader, [])
+            for values in reader:
+                yield dict(zip(header, values))
+
+def load_source(path):
+    """Return ({email: name}, {isbn: book record}) from a catalog file"""
+    authors = {}
+    books = {}
+    this_year = current_year()
+    for line, record in enumerate(read_source(path), start=1):
+        email = (record.get("author_email") or "").strip()
+        if not email:
+            raise ValueError(f"{path}: record {line} has no author_email")
+        authors[email] = (record.get("author_name") or "").strip()
+
+        isbn = str(record.get("isbn") or "").strip()
+        if not isbn:
+            continue
+        try:
+            books[isbn] = {
+                "title": record["title"].strip(),
+                "isbn": isbn,
+                "publication_year": int(record["publication_year"]),
+                "genre": record["genre"].strip(),
+                "author_email": email,
+            }
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"{path}: record {line} is not a valid book ({e})")
+        # The rules the CLI applies when a book is added by hand
+        if not valid_isbn(isbn):
+            raise ValueError(f"{path}: record {line} has an invalid ISBN {isbn!r} (10 or 13 digits)")
+        if not valid_publication_year(books[isbn]["publication_year"], this_year):
+            raise ValueError(
+                f"{path}: record {line} has publication year {books[isbn]['publication_year']}, "
+                f"outside {MIN_PUBLICATION_YEAR}-{this_year}"
+            )
+    return authors, books
+
+def _book_binds():
+    """Return the engine of every database holding books"""
+    return router.engines if router else [engine]
+
+def _stored_authors():
+    """Return {email: _StoredRow} for every stored author"""
+    hashed = [getattr(Author, c) for c in Author.HASHED_COLUMNS]
+    with engine.connect() as connection:
+        rows = connection.execute(
+            select(Author.email, Author.id, Author.content_hash).where(Author.content_hash.isnot(None))
+        ).all()
+        # Only rows from before content_hash existed need their columns read
+        unhashed = connection.execute(
+            select(Author.id, *hashed).where(Author.content_hash.is_(None))
+        ).all()
+    stored = {email: _StoredRow(author_id, digest, None, False) for email, author_id, digest in rows}
+    for row in unhashed:
+        stored[row.email] = _StoredRow(row.id, content_hash(*row[1:]), None, True)
+    return stored
+
+def _stored_books():
+    """Return {isbn: _StoredRow} for every stored book, from every shard"""
+    hashed = [getattr(Book, c) for c in Book.HASHED_COLUMNS]
+    stored = {}
+    for bind in _book_binds():
+        with bind.connect() as connection:
+            rows = connection.execute(
+                select(Book.isbn, Book.id, Book.content_hash, Book.author_id)
+                .where(Book.content_hash.isnot(None))
+            ).all()
+            unhashed = connection.execute(
+                select(Book.id, *hashed).where(Book.content_hash.is_(None))
+            ).all()
+        stored.update(
+            (isbn, _StoredRow(book_id, digest, author_id, False)) for isbn, book_id, digest, author_id in rows
+        )
+        for row in unhashed:
+            stored[row.isbn] = _StoredRow(row.id, content_hash(*row[1:]), row.author_id, True)
+    return stored
+
+def plan_sync(path, delete_missing=True):
+    """Diff a catalog file against the database; returns a SyncPlan without writing"""
+    incoming_authors, incoming_books = load_source(path)
+    stored_authors = _stored_authors()
+    stored_books = _stored_books()
+    plan = SyncPlan()
+
+    for email, name in incoming_authors.items():
+        digest = content_hash(name, email)
+        stored = stored_authors.get(email)
+        row = {"name": name, "email": email, "content_hash": digest}
+        if stored is None:
+            plan.author_inserts.append(row)
+        elif stored.digest != digest:
+            plan.author_updates.append(dict(row, id=stored.id))
+        else:
+            plan.unchanged_authors += 1
+            if stored.backfill:
+                plan.author_backfills.append({"id": stored.id, "content_hash": digest})
+
+    # New authors have no ID yet, so their books always count as changed
+    author_ids = {email: stored.id for email, stored in stored_authors.items()}
+    for isbn, record in incoming_books.items():
+        author_id = author_ids.get(record["author_email"])
+        digest = content_hash(*(record[c] for c in BOOK_FIELDS), author_id)
+        stored = stored_books.get(isbn)
+        if stored is None:
+            plan.book_inserts.append(dict(record, author_id=author_id, content_hash=digest))
+        elif stored.digest != digest:
+            plan.book_updates.append(dict(
+                record, author_id=author_id, content_hash=digest, id=stored.id, old_author_id=stored.author_id
+            ))
+        else:
+            plan.unchanged_books += 1
+            if stored.backfill:
+                plan.book_backfills.append({"id": stored.id, "content_hash": digest})
+
+    missing_authors = [(email, row) for email, row in stored_authors.items() if email not in incoming_authors]
+    missing_books = [(isbn, row) for isbn, row in stored_books.items() if isbn not in incoming_books]
+    if delete_missing:
+        plan.author_deletes = [{"id": stored.id, "email": email} for email, stored in missing_authors]
+        plan.book_deletes = [
+            {"id": stored.id, "isbn": isbn, "author_id": stored.author_id} for isbn, stored in missing_books
+        ]
+    else:
+        plan.author_backfills += [
+            {"id": stored.id, "content_hash": stored.digest} for _, stored in missing_authors if stored.backfill
+        ]
+        plan.book_backfills += [
+            {"id": stored.id, "content_hash": stored.digest} for _, stored in missing_books if stored.backfill
+        ]
+    return plan
+
+def _in_batches(rows, batch_size, open_session, apply):
+    """Run apply(session, batch) for each batch of rows in its own transaction"""
+    for start in range(0, len(rows), batch_size):
+        session = open_session()
+        try:
+            apply(session, rows[start:start + batch_size])
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+
+def _by_database(rows, shard_of):
+    """Group rows by the session factory of the database they belong to"""
+    if router is None:
+        return [(get_session, rows)]
+    groups = {}
+    for row in rows:
+        groups.setdefault(shard_of(row), []).append(row)
+    return [(lambda shard=shard: router.session(shard), group) for shard, group in groups.items()]
+
+def _book_values(row):
+    return {
+        "title": row["title"], "isbn": row["isbn"], "publication_year": row["publication_year"],
+        "genre": row["genre"], "author_id": row["author_id"], "content_hash": row["content_hash"],
+    }
+
+def _insert_authors(session, rows):
+    # Bulk INSERT ... RETURNING hands back the new rows for the journal
+    authors = session.scalars(insert(Author).returning(Author), rows).all()
+    record_changes(session, INSERT, authors)
+
+def _journal_rows(session, operation, model, ids):
+    """Journal the full current rows, so the images match what the flush hook writes"""
+    record_changes(session, operation, session.scalars(select(model).where(model.id.in_(ids))).all())
+
+def _update_authors(session, rows):
+    values = [{key: row[key] for key in ("id", "name", "email", "content_hash")} for row in rows]
+    session.execute(update(Author), values)
+    _journal_rows(session, UPDATE, Author, [row["id"] for row in rows])
+
+def _insert_books(session, rows):
+    if router is None:
+        books = session.scalars(insert(Book).returning(Book), [_book_values(row) for row in rows]).all()
+    else:
+        books = []
+        for row in rows:
+            result = session.execute(insert(Book.__table__).values(
+                id=router.next_book_id(row["author_id"]), **_book_values(row)
+            ))
+            books.append(session.get(Book, result.lastrowid))
+    record_changes(session, INSERT, books)
+
+def _update_books(session, rows):
+    values = [dict(_book_values(row), id=row["id"]) for row in rows]
+    session.execute(update(Book), values)
+    _journal_rows(session, UPDATE, Book, [row["id"] for row in rows])
+
+def _delete_books(session, rows):
+    ids = [row["id"] for row in rows]
+    _journal_rows(session, DELETE, Book, ids)
+    session.execute(delete(Book).where(Book.id.in_(ids)))
+
+def _backfill_hashes(model):
+    def apply(session, rows):
+        # The row's content is unchanged, so this isn't journaled
+        session.execute(update(model), rows)
+    return apply
+
+def _books_of_authors(author_ids):
+    """Return the delete rows for books still filed under any of author_ids"""
+    rows = []
+    for bind in _book_binds():
+        with bind.connect() as connection:
+            for start in range(0, len(author_ids), SYNC_BATCH_SIZE):
+                chunk = author_ids[start:start + SYNC_BATCH_SIZE]
+                rows += [
+                    {"id": book_id, "isbn": isbn, "author_id": author_id}
+                    for book_id, isbn, author_id in connection.execute(
+                        select(Book.id, Book.isbn, Book.author_id).where(Book.author_id.in_(chunk))
+                    )
+                ]
+    return rows
+
+def _new_author_ids(emails):
+    """Return {email: id} for authors inserted by this sync"""
+    ids = {}
+    with engine.connect() as connection:
+        for start in range(0, len(emails), SYNC_BATCH_SIZE):
+            chunk = emails[start:start + SYNC_BATCH_SIZE]
+            ids.update(connection.execute(
+                select(Author.email, Author.id).where(Author.email.in_(chunk))
+            ).all())
+    return ids
+
+def _delete_authors(session, rows):
+    ids = [row["id"] for row in rows]
+    _journal_rows(session, DELETE, Author, ids)
+    session.execute(delete(Author).where(Author.id.in_(ids)))
+
+def apply_sync(plan, batch_size=None):
+    """Write a SyncPlan in batched transactions; returns a SyncResult"""
+    batch_size = batch_size or SYNC_BATCH_SIZE
+    start = time.perf_counter()
+
+    _in_batches(plan.author_inserts, batch_size, get_session, _insert_authors)
+    _in_batches(plan.author_updates, batch_size, get_session, _update_authors)
+    _in_batches(plan.author_backfills, batch_size, get_session, _backfill_hashes(Author))
+
+    # Books of new authors were planned without an author ID
+    author_ids = _new_author_ids([row["email"] for row in plan.author_inserts])
+    for row in plan.book_inserts + plan.book_updates:
+        if row["author_id"] is None:
+            row["author_id"] = author_ids[row["author_email"]]
+            row["content_hash"] = content_hash(*(row[c] for c in BOOK_FIELDS), row["author_id"])
+
+    book_inserts = list(plan.book_inserts)
+    book_updates = []
+    book_deletes = list(plan.book_deletes)
+    # Books written for a deleted author since the plan was made go with it
+    planned = {row["id"] for row in book_deletes + plan.book_updates}
+    book_deletes += [
+        row for row in _books_of_authors([row["id"] for row in plan.author_deletes])
+        if row["id"] not in planned
+    ]
+    for row in plan.book_updates:
+        # Book IDs encode their shard, so moving to another shard is a delete and an insert
+        if router is not None and router.shard_for_author(row["author_id"]) != router.shard_for_book(row["id"]):
+            book_deletes.append({"id": row["id"], "isbn": row["isbn"], "author_id": row["old_author_id"]})
+            book_inserts.append(row)
+        else:
+            book_updates.append(row)
+
+    # Deletes first, so an ISBN that moved shards is free again for its insert
+    for open_session, rows in _by_database(book_deletes, lambda row: router.shard_for_book(row["id"])):
+        _in_batches(rows, batch_size, open_session, _delete_books)
+    for open_session, rows in _by_database(book_updates, lambda row: router.shard_for_book(row["id"])):
+        _in_batches(rows, batch_size, open_session, _update_books)
+    for open_session, rows in _by_database(book_inserts, lambda row: router.shard_for_author(row["author_id"])):
+        _in_batches(rows, batch_size, open_session, _insert_books)
+    for open_session, rows in _by_database(plan.book_backfills, lambda row: router.shard_for_book(row["id"])):
+        _in_batches(rows, batch_size, open_session, _backfill_hashes(Book))
+
+    _in_batches(plan.author_deletes, batch_size, get_session, _delete_authors)
+
+    if plan.changes:
+        author_index.reset()
+        from .maintenance import refresh_statistics
+        refresh_statistics()
+    return SyncResult(plan, time.perf_counter() - start)
+
+def sync(path, dry_run=False, delete_missing=True, batch_size=None):
+    """Plan and (unless dry_run) apply a sync from a catalog file; returns a SyncResult"""
+    start = time.perf_counter()
+    plan = plan_sync(path, delete_missing)
+    if dry_run:
+        return SyncResult(plan, time.perf_counter() - start)
+    apply_sync(plan, batch_size)
+    return SyncResult(plan, time.perf_counter() - start)
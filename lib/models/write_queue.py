@@ -0,0 +1,227 @@
+from concurrent.futures import Future
+from sqlalchemy import inspect
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.attributes import set_committed_value
+from . import engine
+from .author_index import author_index
+from .sharding import router
+import os
+import queue
+import threading
+import time
+
+# Set WRITE_QUEUE=1 to send Author and Book writes through one writer thread
+WRITE_QUEUE_ENABLED = os.environ.get('WRITE_QUEUE', '0') == '1'
+# Most requests committed together in one transaction
+WRITE_BATCH_SIZE = int(os.environ.get('WRITE_BATCH_SIZE', '256'))
+# How long the writer waits for more requests to join a batch (seconds)
+WRITE_BATCH_LINGER = float(os.environ.get('WRITE_BATCH_LINGER', '0.002'))
+
+_STOP = object()
+
+class _WriteRequest:
+    def __init__(self, apply, after_commit):
+        self.apply = apply
+        self.after_commit = after_commit
+        self.future = Future()
+
+
+class WriteQueue:
+    """Funnels writes from many threads through one writer thread and connection.
+
+    Producers submit create/update/delete requests and get a Future back.
+    The writer drains the queue into batches and commits each batch as one
+    transaction, so concurrent writers never fight over SQLite's write lock.
+    If anything in a batch fails, the batch is rolled back and its requests
+    are retried one per transaction, so only the offending futures get the
+    error (e.g. an IntegrityError for a duplicate email).
+    """
+
+    def __init__(self, bind=None, max_batch=None, linger=None):
+        # Keep attribute values after commit so results are usable once detached
+        self._session_factory = sessionmaker(bind=bind or engine, expire_on_commit=False)
+        self.max_batch = max_batch or WRITE_BATCH_SIZE
+        self.linger = WRITE_BATCH_LINGER if linger is None else linger
+        self.stats = {"requests": 0, "batches": 0, "retried_batches": 0, "errors": 0}
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+        self._thread.start()
+
+    def submit(self, apply, after_commit=None):
+        """Queue apply(session) to run in the writer's transaction; returns a Future"""
+        if self._closed:
+            raise RuntimeError("Write queue is closed")
+        request = _WriteRequest(apply, after_commit)
+        self._queue.put(request)
+        return request.future
+
+    def create_author(self, name, email):
+        """Queue an author insert; the Future resolves to the new Author"""
+        from .author import Author
+        return self.submit(
+            lambda session: _add(session, Author(name=name, email=email)),
+            after_commit=lambda author: author_index.add(author.id, author.name, author.email)
+        )
+
+    def create_book(self, title, isbn, publication_year, genre, author_id):
+        """Queue a book insert; the Future resolves to the new Book"""
+        from .book import Book
+        _check_unsharded()
+        return self.submit(lambda session: _add(session, Book(
+            title=title,
+            isbn=isbn,
+            publication_year=publication_year,
+            genre=genre,
+            author_id=author_id
+        )))
+
+    def update(self, model, row_id, **fields):
+        """Queue an update of one row; the Future resolves to the updated object"""
+        _check_model(model)
+
+        def apply(session):
+            obj = _get(session, model, row_id)
+            for key, value in fields.items():
+                setattr(obj, key, value)
+            session.flush()
+            return obj
+
+        after_commit = None
+        if model.__tablename__ == 'authors':
+            after_commit = lambda author: author_index.update(author.id, author.name, author.email)
+        return self.submit(apply, after_commit)
+
+    def delete(self, model, row_id):
+        """Queue a delete of one row; the Future resolves to True"""
+        # Deleting an author cascades to their books, which may live on a shard
+        _check_unsharded()
+
+        def apply(session):
+            session.delete(_get(session, model, row_id))
+            session.flush()
+            return True
+
+        after_commit = None
+        if model.__tablename__ == 'authors':
+            after_commit = lambda _: author_index.remove(row_id)
+        return self.submit(apply, after_commit)
+
+    def close(self):
+        """Finish queued writes and stop the writer thread"""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.linger
+            while len(batch) < self.max_batch:
+                try:
+                    request = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if request is _STOP:
+                    stopping = True
+                    break
+                batch.append(request)
+            self._execute(batch)
+
+    def _execute(self, batch):
+        batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        self.stats["batches"] += 1
+        self.stats["requests"] += len(batch)
+
+        session = self._session_factory()
+        try:
+            results = [request.apply(session) for request in batch]
+            session.commit()
+        except Exception:
+            session.rollback()
+            session.close()
+            # Retry one per transaction so only the failing requests see an error
+            self.stats["retried_batches"] += 1
+            for request in batch:
+                self._execute_one(request)
+            return
+        session.close()
+        for request, result in zip(batch, results):
+            _resolve(request, result)
+
+    def _execute_one(self, request):
+        session = self._session_factory()
+        try:
+            result = request.apply(session)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            self.stats["errors"] += 1
+            request.future.set_exception(e)
+            return
+        finally:
+            session.close()
+        _resolve(request, result)
+
+def _resolve(request, result):
+    if request.after_commit:
+        try:
+            request.after_commit(result)
+        except Exception:
+            # The write is committed; a stale cache must not fail the caller
+            pass
+    request.future.set_result(result)
+
+def _add(session, obj):
+    session.add(obj)
+    session.flush()
+    return obj
+
+def _get(session, model, row_id):
+    obj = session.get(model, row_id)
+    if obj is None:
+        raise LookupError(f"{model.__name__} with ID {row_id} not found")
+    return obj
+
+def _check_unsharded():
+    if router is not None:
+        raise ValueError("The write queue only serializes the main database; "
+                         "use the Book and Author methods in sharded mode")
+
+def _check_model(model):
+    if model.__tablename__ == 'books':
+        _check_unsharded()
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+def get_write_queue():
+    """Return the process-wide write queue, starting its writer thread on first use"""
+    global _write_queue
+    with _write_queue_lock:
+        if _write_queue is None:
+            _write_queue = WriteQueue()
+        return _write_queue
+
+def queued_writes():
+    """Return the write queue model writes should use, or None to write directly.
+
+    The queue is used when WRITE_QUEUE=1, except in sharded mode, where book
+    writes go to other files than the one its writer owns.
+    """
+    if not WRITE_QUEUE_ENABLED or router is not None:
+        return None
+    return get_write_queue()
+
+def copy_committed(target, source):
+    """Give target the column values the writer committed for the same row"""
+    for attr in inspect(source).mapper.column_attrs:
+        set_committed_value(target, attr.key, getattr(source, attr.key))
+    return target
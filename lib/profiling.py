@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Per-action profiling for the Library Management System
+When enabled, every menu action is run under cProfile (CPU time) and
+tracemalloc, and a report is written per action to the profile directory.
+
+    python main.py --profile [DIR]              # or LIBRARY_PROFILE=DIR python main.py
+    python lib/profiling.py merge DIR [DIR...]  # aggregate reports across sessions
+"""
+
+import argparse
+import cProfile
+import functools
+import glob
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+DEFAULT_PROFILE_DIR = "profiles"
+TOP_FUNCTIONS = 20
+TOP_ALLOCATIONS = 10
+
+_profile_dir = None
+_state = threading.local()
+_counter = 0
+
+def enable(directory=DEFAULT_PROFILE_DIR):
+    """Start writing a report for every profiled action to directory"""
+    global _profile_dir
+    os.makedirs(directory, exist_ok=True)
+    _profile_dir = directory
+
+def disable():
+    global _profile_dir
+    _profile_dir = None
+
+def is_enabled():
+    return _profile_dir is not None
+
+def _process_peak_rss_kb():
+    """Highest RSS the whole process has reached so far, or None where unavailable.
+
+    ru_maxrss never goes down, so this is not the action's own peak; use
+    peak_traced_bytes for that.
+    """
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def _top_functions(profile):
+    stats = pstats.Stats(profile)
+    rows = []
+    for (filename, line, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{line}({name})",
+            "ncalls": ncalls,
+            "tottime": round(tottime, 6),
+            "cumtime": round(cumtime, 6),
+        })
+    rows.sort(key=lambda row: row["cumtime"], reverse=True)
+    return rows[:TOP_FUNCTIONS]
+
+def _top_allocations(snapshot):
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ))
+    return [
+        {"site": str(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+        for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+    ]
+
+def _write_report(action, profile, snapshot, traced_peak, cpu_seconds, wall_seconds, started):
+    global _counter
+    _counter += 1
+    stem = os.path.join(
+        _profile_dir, f"{started:%Y%m%d-%H%M%S}-{os.getpid()}-{_counter:04d}-{action}"
+    )
+    profile.dump_stats(stem + ".prof")
+    report = {
+        "action": action,
+        "started": started.isoformat(),
+        "pid": os.getpid(),
+        "cpu_seconds": round(cpu_seconds, 6),
+        "wall_seconds": round(wall_seconds, 6),
+        "peak_traced_bytes": traced_peak,
+        "process_peak_rss_kb": _process_peak_rss_kb(),
+        "top_functions": _top_functions(profile),
+        "top_allocations": _top_allocations(snapshot),
+    }
+    with open(stem + ".json", "w") as handle:
+        json.dump(report, handle, indent=2)
+
+def profiled(func):
+    """Profile each call of a menu action when profiling is enabled.
+
+    Only the outermost profiled call on a thread is measured, so actions that
+    call other actions produce one report.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _profile_dir is None or getattr(_state, "active", False):
+            return func(*args, **kwargs)
+
+        _state.active = True
+        started = datetime.now()
+        # CPU time, so waiting at an input() prompt doesn't count
+        profile = cProfile.Profile(time.process_time)
+        tracing = tracemalloc.is_tracing()
+        if tracing and hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        else:
+            # reset_peak() is new in Python 3.9; restarting also zeroes the peak
+            tracemalloc.stop()
+            tracemalloc.start()
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            cpu_seconds = time.process_time() - cpu_start
+            wall_seconds = time.perf_counter() - wall_start
+            snapshot = tracemalloc.take_snapshot()
+            _, traced_peak = tracemalloc.get_traced_memory()
+            if not tracing:
+                tracemalloc.stop()
+            _state.active = False
+            try:
+                _write_report(func.__name__, profile, snapshot, traced_peak,
+                              cpu_seconds, wall_seconds, started)
+            except OSError as e:
+                print(f"❌ Could not write profile for {func.__name__}: {e}")
+    return wrapper
+
+def merge(directories):
+    """Aggregate per-action reports from one or more profile directories"""
+    actions = {}
+    prof_files = {}
+    for directory in directories:
+        for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+            with open(path) as handle:
+                report = json.load(handle)
+            summary = actions.setdefault(report["action"], {
+                "calls": 0, "cpu_seconds": 0.0, "wall_seconds": 0.0,
+                "max_cpu_seconds": 0.0, "max_peak_traced_bytes": 0, "max_process_peak_rss_kb": None,
+            })
+            summary["calls"] += 1
+            summary["cpu_seconds"] += report["cpu_seconds"]
+            summary["wall_seconds"] += report["wall_seconds"]
+            summary["max_cpu_seconds"] = max(summary["max_cpu_seconds"], report["cpu_seconds"])
+            summary["max_peak_traced_bytes"] = max(
+                summary["max_peak_traced_bytes"], report["peak_traced_bytes"]
+            )
+            # Reports written before the rename call it peak_rss_kb
+            rss = report.get("process_peak_rss_kb", report.get("peak_rss_kb"))
+            if rss is not None:
+                summary["max_process_peak_rss_kb"] = max(summary["max_process_peak_rss_kb"] or 0, rss)
+            prof_path = path[:-len(".json")] + ".prof"
+            if os.path.exists(prof_path):
+                prof_files.setdefault(report["action"], []).append(prof_path)
+    return actions, prof_files
+
+def render_merge(actions, prof_files, top=TOP_FUNCTIONS):
+    """Return the merged reports as text, slowest actions first"""
+    out = io.StringIO()
+    out.write(f"{'Action':<28}{'Calls':>7}{'CPU total':>12}{'CPU mean':>11}"
+              f"{'CPU max':>10}{'Peak alloc':>13}{'Process RSS peak':>18}\n")
+    ranked = sorted(actions.items(), key=lambda item: item[1]["cpu_seconds"], reverse=True)
+    for action, summary in ranked:
+        rss = summary["max_process_peak_rss_kb"]
+        rss = f"{rss / 1024:>15.1f} MB" if rss is not None else f"{'n/a':>18}"
+        out.write(
+            f"{action:<28}{summary['calls']:>7}{summary['cpu_seconds']:>11.3f}s"
+            f"{summary['cpu_seconds'] / summary['calls']:>10.3f}s{summary['max_cpu_seconds']:>9.3f}s"
+            f"{summary['max_peak_traced_bytes'] / 1024:>10.0f} KB{rss}\n"
+        )
+    out.write("Process RSS peak is the whole process's high-water mark when the action "
+              "finished, not the action's own.\n")
+    for action, _ in ranked:
+        paths = prof_files.get(action)
+        if not paths:
+            continue
+        out.write(f"\n=== {action}: top {top} functions by cumulative CPU time ===\n")
+        stats = pstats.Stats(*paths, stream=out)
+        stats.sort_stats("cumulative").print_stats(top)
+    return out.getvalue()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="profiling", description="Work with CLI profile reports")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    merge_parser = subcommands.add_parser("merge", help="aggregate reports across sessions")
+    merge_parser.add_argument("directories", nargs="+", metavar="DIR")
+    merge_parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    actions, prof_files = merge(args.directories)
+    if not actions:
+        print("No profile reports found.")
+    elif args.json:
+        print(json.dumps(actions, indent=2))
+    else:
+        print(render_merge(actions, prof_files))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Query plan report for the Library Management System
+Seeds a throwaway database, runs every model finder and mutation (the
+scenarios below) and prints the EXPLAIN QUERY PLAN of every statement they
+send, marking full table scans. tests/test_query_plans.py runs the same
+scenarios as part of the test suite.
+
+    python lib/query_plans.py            # report + exit status
+    python lib/query_plans.py --quiet    # only print regressions
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+
+from sqlalchemy import event, text
+
+# A table scan that is not walking an index
+_FULL_SCAN = re.compile(r"^SCAN (\w+)(?! USING (COVERING )?INDEX)(?! USING INTEGER PRIMARY KEY)")
+
+SEED_AUTHORS = 200
+SEED_BOOKS_PER_AUTHOR = 10
+GENRES = ["Fiction", "Mystery", "Poetry", "History", "Romance"]
+
+def seed_isbn(author_number, book_number):
+    """Return the ISBN seed() gives an author's book"""
+    return f"{author_number:06d}{book_number:07d}"
+
+def seed():
+    """Fill the database and give the planner statistics"""
+    from models import create_tables, get_session
+    from models.author import Author
+    from models.book import Book
+    create_tables()
+    session = get_session()
+    try:
+        for a in range(1, SEED_AUTHORS + 1):
+            author = Author(name=f"Author {a}", email=f"author{a}@example.com")
+            session.add(author)
+            for b in range(SEED_BOOKS_PER_AUTHOR):
+                session.add(Book(
+                    title=f"Book {a}-{b}",
+                    isbn=seed_isbn(a, b),
+                    publication_year=1900 + (a * 7 + b) % 125,
+                    genre=GENRES[(a + b) % len(GENRES)],
+                    author=author
+                ))
+        session.commit()
+        session.execute(text("ANALYZE"))
+        session.commit()
+    finally:
+        session.close()
+
+def scenarios():
+    """Return (label, must_use_index, action) for every statement path in the model layer"""
+    from models import journal
+    from models.author import Author
+    from models.book import Book
+
+    def update_book():
+        Book.find_by_id(3).update(title="Renamed")
+
+    def delete_book():
+        Book.find_by_id(4).delete()
+
+    def update_author():
+        Author.find_by_id(5).update(name="Renamed Author")
+
+    def delete_author():
+        Author.find_by_id(6).delete()
+
+    return [
+        ("Author.find_by_id", True, lambda: Author.find_by_id(10)),
+        ("Author.find_by_id(with_books)", True, lambda: Author.find_by_id(11, with_books=True)),
+        ("Author.find_many(with_books)", True, lambda: Author.find_many([12, 13, 14], with_books=True)),
+        ("Author.find_by_email", True, lambda: Author.find_by_email("author15@example.com")),
+        ("Author.book_count", True, lambda: Author.find_by_id(16).book_count),
+        ("Author.update", True, update_author),
+        ("Author.delete", True, delete_author),
+        ("Author.find_by_name", False, lambda: Author.find_by_name("Author 1")),
+        ("Author.get_all", False, Author.get_all),
+        ("Book.find_by_id", True, lambda: Book.find_by_id(20)),
+        ("Book.find_by_isbn", True, lambda: Book.find_by_isbn(seed_isbn(21, 1))),
+        ("Book.find_by_author_id", True, lambda: Book.find_by_author_id(22)),
+        ("Book.iter_by_author_id", True, lambda: list(Book.iter_by_author_id(23))),
+        ("Book.find_by_author_ids", True, lambda: Book.find_by_author_ids([24, 25])),
+        ("Book.count_by_author_id", True, lambda: Book.count_by_author_id(26)),
+        ("Book.delete_by_author_id", True, lambda: Book.delete_by_author_id(27)),
+        ("Book.find_by_year_range", True, lambda: Book.find_by_year_range(1950, 1952)),
+        ("Book.find_recent", True, Book.find_recent),
+        ("Book.count_recent", True, Book.count_recent),
+        ("Book.display_title", True, lambda: Book.find_by_id(28).display_title),
+        ("Book.update", True, update_book),
+        ("Book.delete", True, delete_book),
+        ("Book.count_by_decade", False, Book.count_by_decade),
+        ("Book.average_age", False, Book.average_age),
+        ("Book.find_by_title", False, lambda: Book.find_by_title("Book 1")),
+        ("Book.find_by_genre", False, lambda: Book.find_by_genre("fic")),
+        ("Book.get_all", False, Book.get_all),
+        ("journal.iter_changes", True, lambda: list(journal.iter_changes(since=5))),
+        ("journal.compact", False, journal.compact),
+    ]
+
+def capture(action):
+    """Run action and return the (sql, parameters) it sent to the database"""
+    from models import engine
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and re.match(r"\s*(SELECT|UPDATE|DELETE|WITH)\b", statement, re.I):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        action()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return statements
+
+def explain(statement, parameters):
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement"""
+    from models import engine
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+    return [row[-1] for row in rows]
+
+def full_scans(plan):
+    """Return the plan lines that scan a whole table"""
+    return [line for line in plan if _FULL_SCAN.match(line)]
+
+def check(quiet=False):
+    """Seed, explain every scenario, print the report and return the number of regressions"""
+    seed()
+    regressions = 0
+    for label, must_use_index, action in scenarios():
+        findings = []
+        for statement, parameters in capture(action):
+            plan = explain(statement, parameters)
+            scans = full_scans(plan) if must_use_index else []
+            findings.append((statement, plan, scans))
+        failed = any(scans for _, _, scans in findings)
+        regressions += failed
+
+        if quiet and not failed:
+            continue
+        mark = "❌" if failed else ("✅" if must_use_index else "➖")
+        print(f"\n{mark} {label}{'' if must_use_index else ' (scan allowed)'}")
+        for statement, plan, scans in findings:
+            print(f"   {' '.join(statement.split())}")
+            for line in plan:
+                flag = "  <-- full table scan" if line in scans else ""
+                print(f"      {line}{flag}")
+
+    print(f"\n{'❌' if regressions else '✅'} {regressions} lookup path(s) fell back to a full table scan")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="query_plans", description="Print the query plan of every model lookup")
+    parser.add_argument("--quiet", action="store_true", help="only print regressions")
+    args = parser.parse_args(argv)
+
+    # Point the models at a scratch database before they create their engine
+    scratch = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite:///{scratch.name}/plans.db"
+    os.environ.pop("LIBRARY_SHARDS", None)
+    from models import engine
+    try:
+        sys.exit(1 if check(args.quiet) else 0)
+    finally:
+        engine.dispose()
+        scratch.cleanup()
+
+if __name__ == "__main__":
+    main()
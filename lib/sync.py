@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Catalog sync for the Library Management System
+Brings the database in line with a full catalog file by writing only the rows
+that changed: authors are matched by email, books by ISBN, and a row is
+rewritten only when its content hash differs from the stored one.
+
+    python lib/sync.py catalog.csv --dry-run   # show what would change
+    python lib/sync.py catalog.csv             # apply inserts, updates and deletes
+    python lib/sync.py catalog.jsonl --keep-missing
+
+The file has one line per book with the columns author_name, author_email,
+title, isbn, publication_year and genre (CSV with a header row, or JSON
+lines). A line without an ISBN lists an author with no books.
+"""
+
+import argparse
+import json
+import sys
+
+from models import create_tables
+from models.sync import SYNC_BATCH_SIZE, plan_sync, apply_sync
+
+def _print_plan(plan, show):
+    summary = plan.summary()
+    print("📋 Sync plan:")
+    for table, counts in summary.items():
+        print(f"   {table:<8} +{counts['insert']:,} inserted  ~{counts['update']:,} updated  "
+              f"-{counts['delete']:,} deleted  ({counts['unchanged']:,} unchanged)")
+    if not show:
+        return
+    samples = [
+        ("+ author", plan.author_inserts, "email"), ("~ author", plan.author_updates, "email"),
+        ("- author", plan.author_deletes, "email"), ("+ book", plan.book_inserts, "isbn"),
+        ("~ book", plan.book_updates, "isbn"), ("- book", plan.book_deletes, "isbn"),
+    ]
+    for label, rows, key in samples:
+        for row in rows[:show]:
+            detail = row.get("name") or row.get("title") or ""
+            print(f"   {label} {row[key]} {detail}".rstrip())
+        if len(rows) > show:
+            print(f"   {label} ... and {len(rows) - show:,} more")
+
+def main(argv=None):
+    """Parse arguments and run the sync"""
+    parser = argparse.ArgumentParser(prog="sync", description="Sync the catalog from a full catalog file")
+    parser.add_argument("source", help="catalog file (.csv or .jsonl)")
+    parser.add_argument("--dry-run", action="store_true", help="only show what would change")
+    parser.add_argument("--keep-missing", action="store_true",
+                        help="don't delete authors and books that are missing from the file")
+    parser.add_argument("--batch-size", type=int, default=SYNC_BATCH_SIZE,
+                        help=f"rows written per transaction (default: {SYNC_BATCH_SIZE})")
+    parser.add_argument("--show", type=int, default=5, metavar="N",
+                        help="list up to N example rows per change type (default: 5)")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    create_tables()
+    try:
+        plan = plan_sync(args.source, delete_missing=not args.keep_missing)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(plan.summary(), indent=2))
+    else:
+        _print_plan(plan, args.show)
+
+    if args.dry_run:
+        print("📝 Dry run: nothing was written.", file=sys.stderr)
+    elif not plan.changes:
+        if plan.author_backfills or plan.book_backfills:
+            # Store the hashes of rows from before content_hash existed
+            apply_sync(plan, args.batch_size)
+        print("✅ Already in sync.", file=sys.stderr)
+    else:
+        result = apply_sync(plan, args.batch_size)
+        print(f"✅ Applied {plan.changes:,} change(s) in {result.seconds:.2f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
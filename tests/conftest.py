@@ -0,0 +1,38 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Settings are read when the models are imported, so point them at a scratch
+# database before anything from lib/ is loaded
+_directory = tempfile.mkdtemp(prefix="library-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_directory}/library.db"
+os.environ.pop("LIBRARY_SHARDS", None)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lib"))
+
+from models import Base, create_tables, engine  # noqa: E402
+from models.author_index import author_index  # noqa: E402
+
+
+def _clear():
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+    author_index.reset()
+
+
+@pytest.fixture
+def database():
+    """An empty catalog database; every table is cleared after the test"""
+    create_tables()
+    yield engine
+    _clear()
+
+
+@pytest.fixture(scope="module")
+def module_database():
+    """Like `database`, but shared by the tests of one module"""
+    create_tables()
+    yield engine
+    _clear()
@@ -0,0 +1,38 @@
+from collections import Counter
+
+import pytest
+
+from models.author import Author
+from models.book import Book
+
+np = pytest.importorskip("numpy")
+analytics = pytest.importorskip("analytics")
+
+BOOKS = [
+    ("Poetry", 1923), ("Fiction", 1999), ("Fiction", 1990), ("History", 2005),
+    ("Poetry", 1925), ("Mystery", 2021), ("Fiction", 1901), ("History", 2009),
+]
+
+
+def test_columns_encode_genres_consistently(database):
+    authors = [Author.create(name=f"Author {a}", email=f"a{a}@example.com") for a in range(3)]
+    for number, (genre, year) in enumerate(BOOKS):
+        Book.create(title=f"Book {number}", isbn=f"{number:013d}", publication_year=year,
+                    genre=genre, author_id=authors[number % 3].id)
+
+    columns = analytics.fetch_columns()
+    assert len(columns) == len(BOOKS)
+    decoded = Counter(zip((columns.genres[code] for code in columns.genre_codes), columns.years.tolist()))
+    assert decoded == Counter(BOOKS)
+    assert Counter(columns.author_ids.tolist()) == Counter(authors[n % 3].id for n in range(len(BOOKS)))
+
+    genres, decades, table = analytics.genre_by_decade(columns)
+    assert table.sum() == len(BOOKS)
+    assert table[genres.index("Fiction"), list(decades).index(1990)] == 2
+    assert "Genre by Decade" in analytics.render_report(columns)
+
+
+def test_empty_catalog(database):
+    columns = analytics.fetch_columns()
+    assert len(columns) == 0 and columns.genres == []
+    assert "No books found" in analytics.render_report(columns)
@@ -0,0 +1,64 @@
+from models.author import Author
+from models.author_index import author_index
+
+
+def _names(matches):
+    return [match.name for match in matches]
+
+
+def _seed():
+    return [
+        Author.create("J.R.R. Tolkien", "tolkien@example.com"),
+        Author.create("Ursula K. Le Guin", "ursula@example.com"),
+        Author.create("Terry Pratchett", "pterry@example.com"),
+    ]
+
+
+def test_search_matches_name_word_and_email_prefixes(database):
+    _seed()
+    assert _names(Author.autocomplete("j.r")) == ["J.R.R. Tolkien"]
+    assert _names(Author.autocomplete("TOLK")) == ["J.R.R. Tolkien"]
+    assert _names(Author.autocomplete("le")) == ["Ursula K. Le Guin"]
+    # "pterry@" by email, "Pratchett" by its second word
+    assert _names(Author.autocomplete("p")) == ["Terry Pratchett"]
+    assert Author.autocomplete("  ") == []
+    assert Author.autocomplete("zzz") == []
+
+
+def test_search_returns_each_author_once_up_to_the_limit(database):
+    for i in range(5):
+        Author.create(f"Smith Smithson {i}", f"smith{i}@example.com")
+    # Each author has three keys starting with "smith"
+    matches = Author.autocomplete("smith", limit=3)
+    assert len(matches) == 3
+    assert len({match.id for match in matches}) == 3
+
+
+def test_index_loads_lazily_from_the_database(database):
+    tolkien, _, _ = _seed()
+    author_index.reset()
+    assert len(author_index) == 3
+    assert author_index.get(tolkien.id).email == "tolkien@example.com"
+
+
+def test_rename_replaces_the_old_keys(database):
+    tolkien, _, _ = _seed()
+    assert len(author_index) == 3
+    tolkien.update(name="John Ronald Reuel Tolkien", email="jrrt@example.com")
+
+    assert Author.autocomplete("j.r.r") == []
+    assert Author.autocomplete("tolkien@") == []
+    assert _names(Author.autocomplete("reuel")) == ["John Ronald Reuel Tolkien"]
+    assert _names(Author.autocomplete("jrrt")) == ["John Ronald Reuel Tolkien"]
+    assert author_index.get(tolkien.id).name == "John Ronald Reuel Tolkien"
+
+
+def test_delete_removes_the_author(database):
+    tolkien, ursula, _ = _seed()
+    assert len(author_index) == 3
+    tolkien.delete()
+
+    assert Author.autocomplete("tolk") == []
+    assert author_index.get(tolkien.id) is None
+    assert len(author_index) == 2
+    assert _names(Author.autocomplete("ursula")) == [ursula.name]
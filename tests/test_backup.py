@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import threading
+import time
+
+from models import backup
+
+# Writers may wait this long for a commit while a snapshot is being taken
+MAX_WRITER_STALL = 0.25
+
+
+def _database(path, megabytes, padding, journal_mode="WAL"):
+    connection = sqlite3.connect(path)
+    connection.execute(f"PRAGMA journal_mode = {journal_mode}")
+    connection.execute("CREATE TABLE ledger (id INTEGER PRIMARY KEY, padding BLOB)")
+    connection.execute("CREATE TABLE mirror (id INTEGER PRIMARY KEY)")
+    connection.executemany("INSERT INTO ledger (padding) VALUES (?)",
+                           ((padding(),) for _ in range(megabytes * 1000)))
+    connection.execute("INSERT INTO mirror (id) SELECT id FROM ledger")
+    connection.commit()
+    connection.close()
+
+
+def test_snapshot_is_consistent_and_does_not_stall_writers(tmp_path):
+    source = str(tmp_path / "live.db")
+    _database(source, 48, lambda: os.urandom(1000))
+
+    stop = threading.Event()
+    commits = []
+    errors = []
+
+    def write():
+        # Each transaction writes both tables; a torn copy would show different counts
+        connection = sqlite3.connect(source, timeout=30)
+        try:
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    cursor = connection.execute("INSERT INTO ledger (padding) VALUES (x'00')")
+                    connection.execute("INSERT INTO mirror (id) VALUES (?)", (cursor.lastrowid,))
+                    connection.commit()
+                    commits.append((start, time.perf_counter()))
+                except sqlite3.Error as e:
+                    errors.append(e)
+                time.sleep(0.002)
+        finally:
+            connection.close()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        time.sleep(0.05)
+        started = time.perf_counter()
+        result = backup.snapshot_file(source, str(tmp_path / "snapshot.db"))
+        finished = time.perf_counter()
+    finally:
+        stop.set()
+        writer.join()
+
+    assert not errors
+    overlapping = [end - start for start, end in commits if start < finished and end > started]
+    inside = [start for start, end in commits if start > started and end < finished]
+    assert len(inside) >= 3, "writers were held off until the snapshot finished"
+    assert max(overlapping) < MAX_WRITER_STALL
+
+    snapshot = sqlite3.connect(result.path)
+    try:
+        assert snapshot.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        ledger, = snapshot.execute("SELECT COUNT(*) FROM ledger").fetchone()
+        mirror, = snapshot.execute("SELECT COUNT(*) FROM mirror").fetchone()
+        missing, = snapshot.execute(
+            "SELECT COUNT(*) FROM ledger WHERE id NOT IN (SELECT id FROM mirror)"
+        ).fetchone()
+    finally:
+        snapshot.close()
+    assert ledger == mirror and missing == 0
+
+
+def test_compressed_snapshot_restores(tmp_path):
+    source = str(tmp_path / "live.db")
+    _database(source, 1, lambda: bytes(1000))
+    result = backup.snapshot_file(source, str(tmp_path / "snapshot.db.gz"), compress=True)
+    assert result.file_bytes < result.database_bytes
+
+    target = str(tmp_path / "restored.db")
+    backup._restore_file(result.path, target)
+    restored = sqlite3.connect(target)
+    try:
+        assert restored.execute("SELECT COUNT(*) FROM mirror").fetchone()[0] == 1000
+    finally:
+        restored.close()
+
+
+def test_snapshot_keeps_the_source_journal_mode(tmp_path):
+    source = str(tmp_path / "rollback.db")
+    _database(source, 1, lambda: bytes(1000), journal_mode="DELETE")
+    result = backup.snapshot_file(source, str(tmp_path / "snapshot.db"))
+
+    connection = sqlite3.connect(source)
+    try:
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    finally:
+        connection.close()
+    assert not os.path.exists(source + "-wal")
+    snapshot = sqlite3.connect(result.path)
+    try:
+        assert snapshot.execute("SELECT COUNT(*) FROM mirror").fetchone()[0] == 1000
+    finally:
+        snapshot.close()
@@ -0,0 +1,86 @@
+from sqlalchemy import event
+
+from models.author import Author
+from models.book import Book
+from models.sharding import ShardRouter
+
+AUTHORS = 6
+BOOKS_EACH = 3
+
+
+def _catalog():
+    ids = []
+    for a in range(AUTHORS):
+        author = Author.create(name=f"Eager {a}", email=f"eager{a}@example.com")
+        ids.append(author.id)
+        for b in range(BOOKS_EACH):
+            Book.create(title=f"Eager {a}-{b}", isbn=f"{a:06d}{b:07d}", publication_year=2000,
+                        genre="Fiction", author_id=author.id)
+    return ids
+
+
+class _Statements:
+    """Collect the SQL sent to some engines while the block runs"""
+
+    def __init__(self, *engines):
+        self.engines = engines
+        self.sql = []
+
+    def _record(self, conn, cursor, statement, *args):
+        self.sql.append(statement)
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self._record)
+
+
+def _walk(authors):
+    """Touch every book and back-reference, as the CLI listings do"""
+    return [(author.book_count, [book.author.name for book in author.books]) for author in authors]
+
+
+def test_find_many_loads_books_with_one_in_query(database):
+    ids = _catalog()
+    with _Statements(database) as statements:
+        authors = Author.find_many(ids, with_books=True)
+    assert len(statements.sql) == 2
+    assert "FROM authors" in statements.sql[0]
+    assert "FROM books" in statements.sql[1] and " IN (" in statements.sql[1]
+
+    # Everything was loaded up front; the session is closed, so a lazy load would fail
+    with _Statements(database) as statements:
+        walked = _walk(authors)
+    assert statements.sql == []
+    assert walked == [(BOOKS_EACH, [f"Eager {a}"] * BOOKS_EACH) for a in range(AUTHORS)]
+
+
+def test_find_by_id_with_books_uses_two_queries(database):
+    ids = _catalog()
+    with _Statements(database) as statements:
+        author = Author.find_by_id(ids[2], with_books=True)
+    assert len(statements.sql) == 2
+    assert _walk([author]) == [(BOOKS_EACH, ["Eager 2"] * BOOKS_EACH)]
+
+
+def test_sharded_find_many_queries_each_shard_once(database, tmp_path, monkeypatch):
+    ids = _catalog()
+    router = ShardRouter(3, f"sqlite:///{tmp_path}/library.db")
+    try:
+        router.create_tables()
+        router.move_books_from(database)
+        monkeypatch.setattr("models.author.router", router)
+        monkeypatch.setattr("models.book.router", router)
+
+        with _Statements(database) as main, _Statements(*router.engines) as shards:
+            authors = Author.find_many(ids, with_books=True)
+        assert len(main.sql) == 1
+        assert len(shards.sql) == len(router.engines)
+        assert all(" IN (" in sql for sql in shards.sql)
+        assert _walk(authors) == [(BOOKS_EACH, [f"Eager {a}"] * BOOKS_EACH) for a in range(AUTHORS)]
+    finally:
+        router.dispose()
@@ -0,0 +1,181 @@
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+import debug
+from models import get_session
+from models.author import Author
+from models.book import Book
+from models.journal import (
+    ChangeEvent, DELETE, INSERT, TRUNCATE, UPDATE, _compaction_deletes, compact, iter_changes, latest_seq
+)
+
+EVENTS = [
+    ("authors", 1, INSERT),
+    ("books", 1, INSERT),
+    ("books", 2, INSERT),
+    ("books", 1, UPDATE),
+    ("authors", 2, INSERT),
+    ("books", None, TRUNCATE),
+    ("books", 3, INSERT),
+    ("authors", 1, UPDATE),
+    ("books", 3, UPDATE),
+    ("books", None, TRUNCATE),
+    ("books", 4, INSERT),
+    ("authors", 2, DELETE),
+    ("books", 4, UPDATE),
+]
+
+
+def _fill(database):
+    journal = ChangeEvent.__table__
+    with database.begin() as connection:
+        connection.execute(insert(journal), [
+            {"table_name": table, "row_id": row_id, "operation": operation}
+            for table, row_id, operation in EVENTS
+        ])
+        return [row.seq for row in connection.execute(select(journal.c.seq).order_by(journal.c.seq))]
+
+
+def _expected(seqs, upto):
+    """Pairwise definition of superseded events, to check the aggregate version against"""
+    events = list(zip(seqs, EVENTS))
+    kept = []
+    for seq, (table, row_id, _) in events:
+        superseded = any(
+            later_seq > seq and later_table == table and (later_row == row_id or later_op == TRUNCATE)
+            for later_seq, (later_table, later_row, later_op) in events
+        )
+        if not superseded or (upto is not None and seq > upto):
+            kept.append(seq)
+    return kept
+
+
+@pytest.mark.parametrize("upto_index", [None, 4, 9])
+def test_compact_keeps_only_the_latest_events(database, upto_index):
+    seqs = _fill(database)
+    upto = None if upto_index is None else seqs[upto_index]
+    expected = _expected(seqs, upto)
+
+    assert compact(upto) == len(seqs) - len(expected)
+    with database.connect() as connection:
+        remaining = connection.execute(select(ChangeEvent.seq).order_by(ChangeEvent.seq)).scalars().all()
+    assert remaining == expected
+
+
+def test_compact_is_idempotent(database):
+    _fill(database)
+    compact()
+    assert compact() == 0
+
+
+@pytest.mark.parametrize("statement", _compaction_deletes(upto=100), ids=["truncates", "rows"])
+def test_compaction_walks_the_row_index(database, statement):
+    sql = str(statement.compile(database, compile_kwargs={"literal_binds": True}))
+    with database.connect() as connection:
+        plan = [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+    # Every pass over the journal goes through its index, never the bare table
+    scans = [step for step in plan if step.startswith(("SCAN change_journal", "SCAN older"))]
+    assert scans and all("INDEX ix_change_journal_row" in step for step in scans), plan
+    assert any(step.startswith("SEARCH older USING COVERING INDEX ix_change_journal_row") for step in plan), plan
+
+
+def _events(database, since=0):
+    with database.connect() as connection:
+        return connection.execute(
+            select(ChangeEvent.table_name, ChangeEvent.row_id, ChangeEvent.operation)
+            .where(ChangeEvent.seq > since).order_by(ChangeEvent.seq)
+        ).all()
+
+
+def _book(author_id, number=1):
+    return Book.create(title=f"Journaled {number}", isbn=f"{number:013d}", publication_year=2001,
+                       genre="Fiction", author_id=author_id)
+
+
+def test_model_writes_are_journaled(database):
+    author = Author.create(name="Journaled", email="journaled@example.com")
+    book = _book(author.id)
+    book_id, isbn = book.id, book.isbn
+    author.update(name="Renamed")
+    book.update(title="Retitled")
+    Book.find_by_id(book_id).delete()
+
+    assert _events(database) == [
+        ("authors", author.id, INSERT),
+        ("books", book_id, INSERT),
+        ("authors", author.id, UPDATE),
+        ("books", book_id, UPDATE),
+        ("books", book_id, DELETE),
+    ]
+    images = [event.to_dict()["row"] for event in iter_changes()]
+    assert images[2]["name"] == "Renamed"
+    assert images[3]["title"] == "Retitled"
+    assert images[4]["isbn"] == isbn
+
+
+def test_journal_row_commits_with_the_write(database):
+    session = get_session()
+    try:
+        session.add(Author(name="Pending", email="pending@example.com"))
+        session.flush()
+        # Written on the session's connection, so only it sees the event yet
+        assert session.query(ChangeEvent).count() == 1
+        assert _events(database) == []
+        session.commit()
+    finally:
+        session.close()
+    assert [operation for _, _, operation in _events(database)] == [INSERT]
+
+
+def test_rolled_back_write_leaves_no_journal_row(database):
+    Author.create(name="Original", email="taken@example.com")
+    before = latest_seq()
+
+    session = get_session()
+    try:
+        session.add(Author(name="Doomed", email="doomed@example.com"))
+        session.flush()
+        session.rollback()
+    finally:
+        session.close()
+    with pytest.raises(IntegrityError):
+        Author.create(name="Duplicate", email="taken@example.com")
+
+    assert latest_seq() == before
+    assert _events(database, since=before) == []
+
+
+def test_author_delete_cascade_is_journaled(database):
+    author = Author.create(name="Cascading", email="cascade@example.com")
+    books = [_book(author.id, number) for number in (1, 2)]
+    since = latest_seq()
+    Author.find_by_id(author.id).delete()
+
+    events = _events(database, since)
+    assert sorted(events) == sorted(
+        [("books", book.id, DELETE) for book in books] + [("authors", author.id, DELETE)]
+    )
+
+
+def test_clear_all_data_is_journaled(database, capsys):
+    author = Author.create(name="Cleared", email="cleared@example.com")
+    _book(author.id)
+    since = latest_seq()
+    debug.clear_all_data()
+
+    assert _events(database, since) == [("books", None, TRUNCATE), ("authors", None, TRUNCATE)]
+    assert Author.count() == 0 and Book.count() == 0
+
+
+def test_iter_changes_returns_only_later_events(database):
+    author = Author.create(name="First", email="first@example.com")
+    since = latest_seq()
+    author.update(name="Second")
+    _book(author.id)
+
+    changes = [event.to_dict() for event in iter_changes(since=since)]
+    assert [change["seq"] for change in changes] == sorted(change["seq"] for change in changes)
+    assert all(change["seq"] > since for change in changes)
+    assert [(change["table"], change["op"]) for change in changes] == [("authors", UPDATE), ("books", INSERT)]
+    assert list(iter_changes(since=latest_seq())) == []
@@ -0,0 +1,60 @@
+import sqlite3
+
+from sqlalchemy import create_engine
+
+from models import maintenance
+
+
+def _legacy_database(path):
+    """A file created before incremental auto_vacuum, with free pages to reclaim"""
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE books (id INTEGER PRIMARY KEY, padding BLOB)")
+    connection.executemany("INSERT INTO books (padding) VALUES (?)", ((bytes(2000),) for _ in range(500)))
+    connection.commit()
+    connection.execute("DELETE FROM books WHERE id % 2 = 0")
+    connection.commit()
+    connection.close()
+
+
+def _auto_vacuum(path):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("PRAGMA auto_vacuum").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_scheduled_run_only_reports_the_conversion(tmp_path):
+    path = tmp_path / "legacy.db"
+    _legacy_database(path)
+    bind = create_engine(f"sqlite:///{path}")
+    try:
+        result = maintenance.maintain(bind)
+    finally:
+        bind.dispose()
+
+    assert result.integrity == "ok"
+    assert result.vacuum == maintenance.CONVERSION_NEEDED
+    assert result.pages_freed == 0
+    assert _auto_vacuum(path) != maintenance.AUTO_VACUUM_INCREMENTAL
+    assert result.bytes_after >= result.bytes_before
+
+
+def test_conversion_on_demand(tmp_path):
+    path = tmp_path / "legacy.db"
+    _legacy_database(path)
+    bind = create_engine(f"sqlite:///{path}")
+    try:
+        converted = maintenance.maintain(bind, convert=True)
+        again = maintenance.maintain(bind)
+    finally:
+        bind.dispose()
+
+    assert converted.vacuum == "full"
+    assert converted.bytes_after < converted.bytes_before
+    assert _auto_vacuum(path) == maintenance.AUTO_VACUUM_INCREMENTAL
+    assert again.vacuum == "incremental"
+
+
+def test_catalog_databases_need_no_conversion(database):
+    assert maintenance.pending_conversions() == []
@@ -0,0 +1,62 @@
+import pytest
+from sqlalchemy import select
+
+from models import get_session
+from models.author import Author
+from models.mirror import Mirror
+
+
+@pytest.fixture
+def mirror(database):
+    Author.create(name="Loaded", email="loaded@example.com")
+    copy = Mirror(bind=database)
+    assert copy.load().loaded
+    yield copy
+    copy.drop()
+
+
+def _mirrored_emails(mirror):
+    with mirror.engine.connect() as connection:
+        return set(connection.scalars(select(Author.email)))
+
+
+def test_uncommitted_writes_stay_out_of_the_mirror(mirror):
+    writer = get_session()
+    try:
+        writer.add(Author(name="Pending", email="pending@example.com"))
+        writer.flush()
+
+        # The writing session reads its own write from the file...
+        assert writer.query(Author).filter_by(email="pending@example.com").one()
+        # ...while everyone else reads the mirror, which doesn't have it yet
+        assert _mirrored_emails(mirror) == {"loaded@example.com"}
+        assert Author.find_by_email("pending@example.com") is None
+
+        writer.commit()
+    finally:
+        writer.close()
+    assert _mirrored_emails(mirror) == {"loaded@example.com", "pending@example.com"}
+    assert Author.find_by_email("pending@example.com").name == "Pending"
+
+
+def test_rolled_back_writes_never_reach_the_mirror(mirror):
+    writer = get_session()
+    try:
+        writer.add(Author(name="Doomed", email="doomed@example.com"))
+        writer.flush()
+        writer.rollback()
+    finally:
+        writer.close()
+    assert mirror.active
+    assert _mirrored_emails(mirror) == {"loaded@example.com"}
+
+
+def test_reads_go_back_to_the_mirror_after_commit(mirror):
+    session = get_session()
+    try:
+        session.add(Author(name="Committed", email="committed@example.com"))
+        session.commit()
+        assert "pending_writes" not in session.info
+        assert session.get_bind(clause=select(Author)) is mirror.engine
+    finally:
+        session.close()
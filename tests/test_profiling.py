@@ -0,0 +1,59 @@
+import json
+import sys
+import tracemalloc
+
+import pytest
+
+import profiling
+
+
+@pytest.fixture
+def profile_dir(tmp_path):
+    profiling.enable(str(tmp_path))
+    yield tmp_path
+    profiling.disable()
+
+
+@profiling.profiled
+def allocate_big():
+    return len(bytearray(8 * 1024 * 1024))
+
+
+@profiling.profiled
+def allocate_small():
+    return len(bytearray(1024))
+
+
+def _reports(directory):
+    return [json.loads(path.read_text()) for path in sorted(directory.glob("*.json"))]
+
+
+@pytest.mark.parametrize("already_tracing", [False, True])
+def test_peak_is_per_action_without_reset_peak(profile_dir, monkeypatch, already_tracing):
+    # Python 3.8 has no tracemalloc.reset_peak()
+    monkeypatch.delattr(tracemalloc, "reset_peak", raising=False)
+    if already_tracing:
+        tracemalloc.start()
+    try:
+        allocate_big()
+        allocate_small()
+        assert tracemalloc.is_tracing() == already_tracing
+    finally:
+        tracemalloc.stop()
+
+    big, small = _reports(profile_dir)
+    assert big["peak_traced_bytes"] >= 8 * 1024 * 1024
+    assert small["peak_traced_bytes"] < 1024 * 1024
+    assert "peak_rss_kb" not in big and big["process_peak_rss_kb"] > 0
+
+
+def test_process_rss_is_optional_and_labelled(profile_dir, monkeypatch):
+    # Importing a module mapped to None raises ImportError, as on Windows
+    monkeypatch.setitem(sys.modules, "resource", None)
+    allocate_small()
+    assert _reports(profile_dir)[0]["process_peak_rss_kb"] is None
+
+    actions, prof_files = profiling.merge([str(profile_dir)])
+    assert actions["allocate_small"]["max_process_peak_rss_kb"] is None
+    text = profiling.render_merge(actions, prof_files)
+    assert "Process RSS peak" in text and "n/a" in text
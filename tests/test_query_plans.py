@@ -0,0 +1,34 @@
+"""Every lookup path in the model layer must be served by an index.
+
+The scenarios in lib/query_plans.py run each model finder and mutation
+against a seeded database; these tests capture the SQL they send and check
+its EXPLAIN QUERY PLAN. `python lib/query_plans.py` prints the same plans as
+a report.
+"""
+
+import pytest
+
+from models.book import Book
+from query_plans import capture, explain, full_scans, scenarios, seed, seed_isbn
+
+
+LOOKUPS = [(label, action) for label, must_use_index, action in scenarios() if must_use_index]
+
+
+@pytest.fixture(scope="module")
+def seeded(module_database):
+    seed()
+    return module_database
+
+
+@pytest.mark.parametrize("action", [action for _, action in LOOKUPS], ids=[label for label, _ in LOOKUPS])
+def test_lookup_uses_an_index(seeded, action):
+    statements = capture(action)
+    assert statements, "the scenario sent no statements"
+    for statement, parameters in statements:
+        plan = explain(statement, parameters)
+        assert not full_scans(plan), f"{' '.join(statement.split())}\n" + "\n".join(plan)
+
+
+def test_seeded_isbn_lookup_finds_its_book(seeded):
+    assert Book.find_by_isbn(seed_isbn(21, 1)).title == "Book 21-1"
@@ -0,0 +1,63 @@
+from sqlalchemy import func, insert, select
+
+from models.author import Author
+from models.book import Book
+from models.sharding import ShardRouter
+
+
+def _catalog(authors=4, books_each=5):
+    isbns = []
+    for a in range(authors):
+        author = Author.create(name=f"Author {a}", email=f"author{a}@example.com")
+        for b in range(books_each):
+            book = Book.create(title=f"Book {a}-{b}", isbn=f"{a:05d}{b:08d}",
+                               publication_year=2000, genre="Fiction", author_id=author.id)
+            isbns.append(book.isbn)
+    return isbns
+
+
+def _shard_books(router):
+    books = Book.__table__
+    rows = []
+    for shard, shard_engine in enumerate(router.engines):
+        with shard_engine.connect() as connection:
+            rows += [(shard, row) for row in connection.execute(select(books)).mappings()]
+    return rows
+
+
+def test_move_books_from_main_onto_shards(database, tmp_path):
+    isbns = _catalog()
+    router = ShardRouter(3, f"sqlite:///{tmp_path}/library.db")
+    try:
+        router.create_tables()
+        assert router.move_books_from(database, batch_size=7) == len(isbns)
+
+        with database.connect() as connection:
+            assert connection.execute(select(func.count()).select_from(Book.__table__)).scalar() == 0
+        rows = _shard_books(router)
+        assert sorted(row["isbn"] for _, row in rows) == sorted(isbns)
+        for shard, row in rows:
+            assert router.shard_for_author(row["author_id"]) == shard
+            assert router.shard_for_book(row["id"]) == shard
+
+        # Nothing left to move on the next start
+        assert router.move_books_from(database) == 0
+    finally:
+        router.dispose()
+
+
+def test_move_books_resumes_after_a_partial_move(database, tmp_path):
+    isbns = _catalog(authors=2, books_each=3)
+    router = ShardRouter(2, f"sqlite:///{tmp_path}/library.db")
+    try:
+        router.create_tables()
+        # As if a previous run copied one book and crashed before deleting it from main
+        with database.connect() as connection:
+            first = dict(connection.execute(select(Book.__table__).limit(1)).mappings().one())
+        with router.engines[router.shard_for_author(first["author_id"])].begin() as connection:
+            connection.execute(insert(Book.__table__).values(**first))
+
+        assert router.move_books_from(database) == len(isbns) - 1
+        assert sorted(row["isbn"] for _, row in _shard_books(router)) == sorted(isbns)
+    finally:
+        router.dispose()
@@ -0,0 +1,85 @@
+from sqlalchemy import event
+
+import helpers
+from models.author import Author
+from models.book import Book, current_year
+from models.sharding import ShardRouter
+
+# (author, [(genre, publication_year), ...])
+CATALOG = [
+    ("Ada", [("Poetry", 1995), ("Fiction", 2001)]),
+    ("Grace", [("Fiction", 1990), ("History", 1999), ("Fiction", current_year())]),
+    ("Linus", [("History", current_year() - 2)]),
+    ("Margaret", []),
+]
+
+
+def _seed():
+    isbn = 0
+    for name, books in CATALOG:
+        author = Author.create(name=name, email=f"{name.lower()}@example.com")
+        for genre, year in books:
+            isbn += 1
+            Book.create(title=f"{name} {isbn}", isbn=f"{isbn:013d}", publication_year=year,
+                        genre=genre, author_id=author.id)
+
+
+def _statements(database, action):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(database, "before_cursor_execute", listener)
+    try:
+        action()
+    finally:
+        event.remove(database, "before_cursor_execute", listener)
+    return statements
+
+
+def test_show_statistics_output(database, capsys):
+    _seed()
+    capsys.readouterr()
+    statements = _statements(database, helpers.show_statistics)
+    lines = [line.strip() for line in capsys.readouterr().out.splitlines() if line.strip()]
+
+    assert "Total Authors: 4" in lines
+    assert "Total Books: 6" in lines
+    genres = lines.index("📚 Books by Genre:")
+    assert lines[genres + 1:genres + 4] == ["Fiction: 3", "History: 2", "Poetry: 1"]
+    decades = lines.index("🗓️  Books by Decade:")
+    assert lines[decades + 1:decades + 3] == ["1990s: 3", "2000s: 1"]
+    assert "🆕 Recent Books (last 10 years): 2" in lines
+    assert lines[-1] == "👑 Most Prolific Author: Grace (3 books)"
+    # Aggregates only: nothing runs once per author or per book
+    assert not any("FROM books" in s and "WHERE books.author_id = " in s for s in statements)
+    assert len(statements) <= 8
+
+
+def test_most_prolific_breaks_ties_by_id(database):
+    first = Author.create(name="First", email="first@example.com")
+    second = Author.create(name="Second", email="second@example.com")
+    author, count = Author.most_prolific()
+    assert (author.id, count) == (first.id, 0)
+    for i in range(2):
+        Book.create(title=f"B{i}", isbn=f"{i + 1:013d}", publication_year=2000,
+                    genre="Fiction", author_id=second.id)
+    Book.create(title="A", isbn=f"{9:013d}", publication_year=2000, genre="Fiction", author_id=first.id)
+    author, count = Author.most_prolific()
+    assert (author.id, count) == (second.id, 2)
+    Book.create(title="A2", isbn=f"{10:013d}", publication_year=2000, genre="Fiction", author_id=first.id)
+    assert Author.most_prolific()[0].id == first.id
+
+
+def test_sharded_statistics_match(database, tmp_path, monkeypatch):
+    _seed()
+    expected = (Author.most_prolific()[0].name, Book.count_by_genre(), Book.count())
+    router = ShardRouter(3, f"sqlite:///{tmp_path}/library.db")
+    try:
+        router.create_tables()
+        router.move_books_from(database)
+        monkeypatch.setattr("models.author.router", router)
+        monkeypatch.setattr("models.book.router", router)
+        author, count = Author.most_prolific()
+        assert (author.name, Book.count_by_genre(), Book.count()) == expected
+        assert count == 3
+    finally:
+        router.dispose()
@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy import select
+
+import models
+from models import stream
+from models.author import Author
+from models.book import Book
+
+
+@pytest.fixture
+def opened_sessions(monkeypatch):
+    """Record every session stream() opens and whether it got closed"""
+    sessions = []
+    open_session = models.get_session
+
+    def tracked():
+        session = open_session()
+        record = {"closed": False}
+        close = session.close
+
+        def tracked_close():
+            record["closed"] = True
+            close()
+        session.close = tracked_close
+        sessions.append(record)
+        return session
+    monkeypatch.setattr(models, "get_session", tracked)
+    return sessions
+
+
+def _authors(count):
+    return [Author.create(name=f"Streamer {i:02d}", email=f"s{i}@example.com").id for i in range(count)]
+
+
+@pytest.mark.parametrize("count", [0, 1, 3, 9, 10])
+def test_stream_yields_every_row_across_chunks(database, count):
+    ids = _authors(count)
+    assert [author.id for author in stream(select(Author).order_by(Author.id), chunk_size=3)] == ids
+
+
+def test_iter_finders_use_the_chunk_size(database, monkeypatch):
+    author_id = _authors(1)[0]
+    for i in range(7):
+        Book.create(title=f"Chunked {i}", isbn=f"{i:013d}", publication_year=2000 + i,
+                    genre="Poetry" if i % 2 else "Fiction", author_id=author_id)
+    monkeypatch.setattr(models, "STREAM_CHUNK_SIZE", 2)
+
+    assert [book.title for book in Book.iter_all()] == [f"Chunked {i}" for i in range(7)]
+    assert len(list(Book.iter_by_title("chunked"))) == 7
+    assert len(list(Book.iter_by_genre("poetry"))) == 3
+    assert len(list(Book.iter_by_author_id(author_id))) == 7
+    assert [author.id for author in Author.iter_by_name("streamer")] == [author_id]
+
+
+def test_session_closes_when_exhausted(database, opened_sessions):
+    _authors(5)
+    iterator = stream(select(Author).order_by(Author.id), chunk_size=2)
+    first = next(iterator)
+    assert first.name == "Streamer 00"
+    assert [record["closed"] for record in opened_sessions] == [False]
+
+    rest = list(iterator)
+    assert len(rest) == 4
+    assert [record["closed"] for record in opened_sessions] == [True]
+    # Objects stay readable after the session is gone
+    assert rest[-1].email == "s4@example.com"
+
+
+def test_session_closes_when_abandoned(database, opened_sessions):
+    _authors(5)
+    iterator = Author.iter_all()
+    next(iterator)
+    iterator.close()
+    assert [record["closed"] for record in opened_sessions] == [True]
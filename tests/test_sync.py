@@ -0,0 +1,130 @@
+import csv
+
+import pytest
+from sqlalchemy import func, select, update
+
+from models import get_session
+from models.author import Author
+from models.book import Book
+from models.journal import ChangeEvent, DELETE, INSERT, UPDATE, iter_changes, latest_seq
+from models.sync import apply_sync, plan_sync, sync
+
+FIELDS = ["author_name", "author_email", "title", "isbn", "publication_year", "genre"]
+
+
+def _write_catalog(path, rows):
+    with open(path, "w", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(FIELDS)
+        writer.writerows(rows)
+    return str(path)
+
+
+def _catalog(tmp_path, authors=3, books_per_author=2, name="catalog.csv"):
+    rows = []
+    for a in range(authors):
+        for b in range(books_per_author):
+            rows.append([f"Author {a}", f"a{a}@example.com", f"Title {a}-{b}",
+                         f"{a:06d}{b:07d}", 2000 + b, "Fiction"])
+    return _write_catalog(tmp_path / name, rows)
+
+
+def _count(database, model):
+    with database.connect() as connection:
+        return connection.scalar(select(func.count()).select_from(model))
+
+
+def test_deleted_authors_take_their_books_in_one_pass(database, tmp_path):
+    sync(_catalog(tmp_path, authors=3))
+    plan = plan_sync(_catalog(tmp_path, authors=2, name="smaller.csv"))
+    assert [row["email"] for row in plan.author_deletes] == ["a2@example.com"]
+
+    # Written after the plan, so only the delete pass can catch it
+    gone = Author.find_by_email("a2@example.com")
+    Book.create("Late", "9999999999999", 2020, "Fiction", gone.id)
+    apply_sync(plan)
+
+    assert Author.find_by_email("a2@example.com") is None
+    assert Book.find_by_author_id(gone.id) == []
+    assert _count(database, Book) == 4
+    session = get_session()
+    try:
+        deleted = session.query(ChangeEvent).filter_by(table_name="books", operation=DELETE).count()
+    finally:
+        session.close()
+    assert deleted == 3
+
+
+def test_missing_hashes_are_stored_once(database, tmp_path):
+    path = _catalog(tmp_path)
+    sync(path)
+    with database.begin() as connection:
+        connection.execute(update(Author.__table__).values(content_hash=None))
+        connection.execute(update(Book.__table__).values(content_hash=None))
+
+    plan = plan_sync(path)
+    assert plan.changes == 0
+    assert (len(plan.author_backfills), len(plan.book_backfills)) == (3, 6)
+    apply_sync(plan)
+
+    with database.connect() as connection:
+        assert connection.scalar(select(func.count()).where(Book.content_hash.is_(None))) == 0
+        assert connection.scalar(select(func.count()).where(Author.content_hash.is_(None))) == 0
+    plan = plan_sync(path)
+    assert (plan.author_backfills, plan.book_backfills) == ([], [])
+    assert plan.unchanged_books == 6
+
+
+def test_kept_rows_missing_from_the_file_get_their_hash(database, tmp_path):
+    sync(_catalog(tmp_path, authors=3))
+    with database.begin() as connection:
+        connection.execute(update(Book.__table__).values(content_hash=None))
+
+    plan = plan_sync(_catalog(tmp_path, authors=2, name="smaller.csv"), delete_missing=False)
+    assert len(plan.book_backfills) == 6
+    apply_sync(plan)
+    assert plan_sync(_catalog(tmp_path, authors=3)).changes == 0
+
+
+def test_sync_journals_the_same_row_images_as_the_orm(database, tmp_path):
+    # Written through the ORM, for reference
+    author = Author.create("Reference", "reference@example.com")
+    Book.create("Reference", "9780000000001", 2001, "Fiction", author.id)
+    reference = {(change["table"], change["op"]): set(change["row"]) for change in
+                 (event.to_dict() for event in iter_changes())}
+
+    path = _catalog(tmp_path, authors=2)
+    sync(path)
+    since = latest_seq()
+    rows = [["Author 0 Jr.", "a0@example.com", "Title 0-0 (2nd ed.)", f"{0:06d}{0:07d}", 2000, "Fiction"]]
+    sync(_write_catalog(tmp_path / "changed.csv", rows))
+
+    changes = [event.to_dict() for event in iter_changes(since=since)]
+    seen = {(change["table"], change["op"]) for change in changes}
+    assert {("authors", UPDATE), ("books", UPDATE), ("authors", DELETE), ("books", DELETE)} <= seen
+    for change in changes:
+        table = change["table"]
+        assert set(change["row"]) == reference[(table, INSERT)], (table, change["op"])
+        assert change["row"]["created_at"] is not None
+        assert change["row"]["id"] == change["id"]
+    updated = next(c for c in changes if c["table"] == "books" and c["op"] == UPDATE)
+    assert updated["row"]["title"] == "Title 0-0 (2nd ed.)"
+    deleted = next(c for c in changes if c["table"] == "authors" and c["op"] == DELETE)
+    assert deleted["row"]["name"] == "Author 1"
+
+
+@pytest.mark.parametrize("isbn, year, problem", [
+    ("12345", 2001, "an invalid ISBN"),
+    ("97800000000AB", 2001, "an invalid ISBN"),
+    ("9780000000001", 999, "publication year 999"),
+    ("9780000000001", 3000, "publication year 3000"),
+])
+def test_invalid_books_are_rejected_before_writing(database, tmp_path, isbn, year, problem):
+    rows = [
+        ["Valid", "valid@example.com", "Fine", "978-0-00-000000-2", 2001, "Fiction"],
+        ["Valid", "valid@example.com", "Broken", isbn, year, "Fiction"],
+    ]
+    with pytest.raises(ValueError, match=f"record 2 has {problem}"):
+        sync(_write_catalog(tmp_path / "invalid.csv", rows))
+    assert _count(database, Author) == 0
+    assert _count(database, Book) == 0
@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from models import write_queue
+from models.author import Author
+from models.write_queue import WriteQueue
+
+PRODUCERS = 32
+WRITES_PER_PRODUCER = 20
+# Emails every fourth producer also submits, so each is sent four times
+SHARED_EMAILS = 8
+
+
+def test_concurrent_producers_with_duplicate_emails(database):
+    queue = WriteQueue(bind=database, linger=0.01)
+    start = threading.Barrier(PRODUCERS)
+    submitted = [[] for _ in range(PRODUCERS)]
+
+    def produce(producer):
+        start.wait()
+        for i in range(WRITES_PER_PRODUCER):
+            email = f"p{producer}-{i}@example.com"
+            submitted[producer].append((email, queue.create_author(f"Author {producer}-{i}", email)))
+        email = f"shared{producer % SHARED_EMAILS}@example.com"
+        submitted[producer].append((email, queue.create_author(f"Shared {producer}", email)))
+
+    threads = [threading.Thread(target=produce, args=(p,)) for p in range(PRODUCERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        outcomes = {}
+        for email, future in (pair for pairs in submitted for pair in pairs):
+            error = future.exception(timeout=30)
+            outcomes.setdefault(email, []).append(error)
+    finally:
+        queue.close()
+
+    unique = {email: errors for email, errors in outcomes.items() if not email.startswith("shared")}
+    shared = {email: errors for email, errors in outcomes.items() if email.startswith("shared")}
+    assert len(unique) == PRODUCERS * WRITES_PER_PRODUCER
+    assert all(errors == [None] for errors in unique.values())
+    assert len(shared) == SHARED_EMAILS
+    for errors in shared.values():
+        assert errors.count(None) == 1
+        assert all(isinstance(error, IntegrityError) for error in errors if error is not None)
+
+    with database.connect() as connection:
+        stored = connection.execute(select(func.count()).select_from(Author.__table__)).scalar()
+    assert stored == len(unique) + len(shared)
+    assert queue.stats["errors"] == PRODUCERS - SHARED_EMAILS
+    assert queue.stats["batches"] < queue.stats["requests"]
+
+
+def test_model_writes_use_the_queue_when_enabled(database, monkeypatch):
+    monkeypatch.setattr(write_queue, "WRITE_QUEUE_ENABLED", True)
+    monkeypatch.setattr(write_queue, "_write_queue", None)
+    try:
+        author = Author.create("Queued", "queued@example.com")
+        author.update(name="Renamed")
+        with pytest.raises(IntegrityError):
+            Author.create("Again", "queued@example.com")
+        assert Author.find_by_id(author.id).name == "Renamed" == author.name
+        assert author.delete() is True
+        assert Author.find_by_id(author.id) is None
+        assert write_queue.get_write_queue().stats["requests"] == 4
+    finally:
+        write_queue.get_write_queue().close()